@@ -0,0 +1,355 @@
+import asyncio
+import httpx
+import json
+import statistics
+import sys
+import time
+import db
+from datetime import datetime, timedelta, timezone
+from playwright.async_api import async_playwright, Page
+from typing import Dict, List
+from scheduler import DatabaseManager, STAGING_COLUMNS
+from browser_pool import SEARCH_CONTEXT_OPTIONS, launch_browser, block_resources
+from fixture_server import FixtureServer
+from listing import Listing
+from listing_query import ListingQuery, search_tsquery, search_sorts
+from price_history import ensure_bid_partitions
+import bring_a_trailer, pcarmarket, cars_and_bids
+
+STAGING_SIZES = [1_000, 10_000, 100_000]
+NEW_LISTING_SIZES = [1_000, 2_000, 4_000, 8_000, 16_000]
+NEW_LISTING_RUNS = 5
+SCRAPER_RUNS = 3
+SEARCH_SIZES = [10_000, 100_000]
+SEARCH_RUNS = 5
+
+# Model strings for synthetic search documents, mixed with a year and serial number per row
+SEARCH_MODELS = [
+	"Porsche 911 997 Carrera", "Porsche 911 991 GT3", "Porsche 911 993 Turbo", "Porsche Boxster 986",
+	"BMW M3 E92 Coupe", "BMW M5 E39", "Mercedes-Benz SL500 R129", "Toyota Land Cruiser FJ40",
+	"Honda S2000 AP1", "Mazda MX-5 Miata NA", "Audi RS4 Avant B7", "Ferrari 328 GTS",
+	"Land Rover Defender 110", "Nissan Skyline GT-R R32", "Chevrolet Corvette Z06 C5"
+]
+
+# Searches timed by the search benchmark, as /db_search request args
+SEARCH_QUERIES = {
+	"exact": {"query": "porsche 997", "prefix": "false", "limit": "50"},
+	"prefix": {"query": "99", "limit": "50"},
+	"rank": {"query": "porsche carrera", "sort": "rank", "limit": "50"}
+}
+
+SCRAPER_MODULES = {
+	'bat': bring_a_trailer,
+	'pcar': pcarmarket,
+	'cab': cars_and_bids
+}
+
+# Sites whose get_all_live can build listings from structured data instead of the DOM
+STRUCTURED_SITES = {'bat', 'cab'}
+
+# Detail page for each site in the fixture corpus, with the title it is scraped under
+DETAIL_FIXTURES = {
+	'bat': ("/listing/2005-porsche-911-carrera-coupe-44/", "2005 Porsche 911 Carrera Coupe 6-Speed"),
+	'pcar': ("/auction/2018-porsche-911-gt3-touring-13/", "2018 Porsche 991.2 GT3 Touring"),
+	'cab': ("/auctions/rx4XwZR0/2012-bmw-m3-coupe-competition-package", "2012 BMW M3 Coupe Competition Package")
+}
+
+
+def _synthetic_results(count: int) -> Dict[str, Listing]:
+	"""Build a scrape result dictionary shaped like the scrapers' output."""
+	now = datetime.now(timezone.utc)
+	results = {}
+	for i in range(count):
+		url = f"https://example.com/listing/{i}/"
+		results[url] = Listing(
+			f"BaT: {1990 + i % 35} Porsche 911 Carrera #{i}",
+			url,
+			f"https://example.com/images/{i}.jpg",
+			now + timedelta(minutes=i % 10_080),
+			f"${(i * 137) % 250_000:,}",
+			1990 + i % 35,
+			source="bat"
+		)
+	return results
+
+
+async def _bench_staging():
+	"""Compare executemany INSERT into a logged table against COPY into an unlogged one."""
+	await db.pool.open()
+	try:
+		async with db.acquire() as conn:
+			await conn.execute("CREATE TABLE IF NOT EXISTS bench_staging_logged (LIKE temp_listings INCLUDING ALL)")
+			await conn.execute("CREATE UNLOGGED TABLE IF NOT EXISTS bench_staging_unlogged (LIKE temp_listings INCLUDING ALL)")
+			try:
+				for size in STAGING_SIZES:
+					records = DatabaseManager._staging_records(_synthetic_results(size), datetime.now(timezone.utc))
+
+					await conn.execute("TRUNCATE bench_staging_logged")
+					start = time.perf_counter()
+					await conn.executemany("""
+						INSERT INTO bench_staging_logged (url, title, image, time, price, price_cents, currency, year, source, scraped_at)
+						VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+					""", records)
+					insert_ms = (time.perf_counter() - start) * 1000
+
+					await conn.execute("TRUNCATE bench_staging_unlogged")
+					start = time.perf_counter()
+					await conn.copy_records_to_table(
+						"bench_staging_unlogged", records=records, columns=STAGING_COLUMNS
+					)
+					copy_ms = (time.perf_counter() - start) * 1000
+
+					print(f"{size:>7} rows: executemany/logged {insert_ms:9.1f} ms | "
+						f"COPY/unlogged {copy_ms:9.1f} ms | {insert_ms / copy_ms:5.1f}x")
+			finally:
+				await conn.execute("DROP TABLE IF EXISTS bench_staging_logged")
+				await conn.execute("DROP TABLE IF EXISTS bench_staging_unlogged")
+	finally:
+		await db.pool.close()
+
+
+async def _bench_new_listings():
+	"""
+	Check that merging a cold-start batch (every URL new) into Postgres scales linearly.
+
+	Each batch goes through the scheduler's full merge inside a transaction that is
+	rolled back, after clearing the site's live listings in the same transaction, so
+	the database is left as it was. Rows of that site stay locked while it runs, so
+	point it at a development database. Each size is merged NEW_LISTING_RUNS times
+	and the median reported.
+	"""
+	await db.pool.open()
+	try:
+		async with db.acquire() as conn:
+			# Created outside the rolled-back transactions, so they are not cached as existing when they do not
+			await ensure_bid_partitions(conn, datetime.now(timezone.utc))
+			per_row = []
+			for size in NEW_LISTING_SIZES:
+				results = _synthetic_results(size)
+				timings = []
+				for _ in range(NEW_LISTING_RUNS):
+					transaction = conn.transaction()
+					await transaction.start()
+					try:
+						await conn.execute("DELETE FROM live_listings WHERE source = 'bat'")
+						start = time.perf_counter()
+						await DatabaseManager._merge(conn, results, "bat", datetime.now(timezone.utc))
+						timings.append(time.perf_counter() - start)
+					finally:
+						await transaction.rollback()
+
+				elapsed = statistics.median(timings)
+				per_row.append(elapsed / size)
+				print(f"{size:>7} new listings: {elapsed * 1000:8.1f} ms ({elapsed / size * 1e6:6.2f} us/row)")
+
+			# Per-row cost should stay roughly flat; a quadratic path grows with the input size
+			print(f"Per-row cost growth {NEW_LISTING_SIZES[0]} -> {NEW_LISTING_SIZES[-1]}: {per_row[-1] / per_row[0]:.2f}x")
+	finally:
+		await db.pool.close()
+
+
+async def _timed(stages: Dict[str, List[float]], stage: str, coro):
+	"""Await coro and record its duration in milliseconds under the given stage."""
+	start = time.perf_counter()
+	result = await coro
+	stages.setdefault(stage, []).append((time.perf_counter() - start) * 1000)
+	return result
+
+
+async def _load(page: Page, url: str, selector: str, timeout: int) -> None:
+	"""Navigate and wait for the first listing to render."""
+	await page.goto(url, timeout=timeout)
+	await page.wait_for_selector(selector, timeout=timeout)
+
+
+async def _live_stages_bat(page: Page, stages: Dict[str, List[float]]) -> int:
+	await _timed(stages, "load", _load(page, f"{bring_a_trailer.BASE_URL}/auctions/", '.listing-card', bring_a_trailer.TIMEOUT))
+	await _timed(stages, "scroll", bring_a_trailer._scroll_to_load_all_listings(page))
+	data = await _timed(stages, "extract", bring_a_trailer.BringATrailerScraper._extract_listings_data(page))
+
+	start = time.perf_counter()
+	scrape_time = datetime.now(timezone.utc)
+	processed = [bring_a_trailer.BringATrailerScraper._process_listing_data(d, scrape_time) for d in data]
+	stages.setdefault("process", []).append((time.perf_counter() - start) * 1000)
+	return sum(1 for p in processed if p)
+
+
+async def _live_stages_pcar(page: Page, stages: Dict[str, List[float]]) -> int:
+	# Result pages are paginated rather than scrolled; "scroll" covers fetching the other pages
+	await _timed(stages, "load", _load(page, f"{pcarmarket.BASE_URL}/auction/all/?page=1", '.post.car', pcarmarket.TIMEOUT))
+	data = await _timed(stages, "extract", pcarmarket.PCarMarketScraper._extract_live_listings(page))
+	last_page = await pcarmarket.PCarMarketScraper._extract_last_page(page)
+
+	start = time.perf_counter()
+	for page_num in range(2, last_page + 1):
+		await page.goto(f"{pcarmarket.BASE_URL}/auction/all/?page={page_num}", timeout=pcarmarket.TIMEOUT)
+		data += await pcarmarket.PCarMarketScraper._extract_live_listings(page)
+	stages.setdefault("scroll", []).append((time.perf_counter() - start) * 1000)
+
+	start = time.perf_counter()
+	processed = [pcarmarket.PCarMarketScraper._process_listing_data(d) for d in data]
+	stages.setdefault("process", []).append((time.perf_counter() - start) * 1000)
+	return sum(1 for p in processed if p)
+
+
+async def _live_stages_cab(page: Page, stages: Dict[str, List[float]]) -> int:
+	await _timed(stages, "load", _load(page, cars_and_bids.BASE_URL, 'ul.auctions-list li.auction-item', cars_and_bids.TIMEOUT))
+	await _timed(stages, "scroll", cars_and_bids._scroll_to_load_all_listings(page))
+	data = await _timed(stages, "extract", cars_and_bids.CarsAndBidsScraper._extract_live_listings(page))
+
+	start = time.perf_counter()
+	scrape_time = datetime.now(timezone.utc)
+	processed = [cars_and_bids.CarsAndBidsScraper._process_listing_data(d, scrape_time) for d in data]
+	stages.setdefault("process", []).append((time.perf_counter() - start) * 1000)
+	return sum(1 for p in processed if p)
+
+
+LIVE_STAGES = {
+	'bat': _live_stages_bat,
+	'pcar': _live_stages_pcar,
+	'cab': _live_stages_cab
+}
+
+
+async def _bench_scrapers():
+	"""
+	Time each live scrape stage per site against the local fixture corpus.
+
+	Stages are page load, scroll (or pagination), extraction in the page and
+	_process_listing_data in Python, followed by keyword extraction from a
+	detail page in the browser and, where the site has an HTTP parser, from the
+	same HTML over plain HTTP. For sites that support it, the full get_all_live
+	is also timed with and without structured data.
+	Each site is run SCRAPER_RUNS times and the median of each stage reported.
+	"""
+	live_urls = {site: module.BASE_URL for site, module in SCRAPER_MODULES.items()}
+	async with FixtureServer() as server, async_playwright() as p:
+		for site, module in SCRAPER_MODULES.items():
+			module.BASE_URL = server.url(site)
+
+		browser = await launch_browser(p)
+		http = httpx.AsyncClient()
+		try:
+			context = await browser.new_context(**SEARCH_CONTEXT_OPTIONS)
+			await block_resources(context)
+
+			for site, module in SCRAPER_MODULES.items():
+				stages: Dict[str, List[float]] = {}
+				count = 0
+				detail_path, title = DETAIL_FIXTURES[site]
+				detail_url = f"{server.url(site)}{detail_path}"
+
+				for _ in range(SCRAPER_RUNS):
+					page = await context.new_page()
+					try:
+						count = await LIVE_STAGES[site](page, stages)
+						await _timed(stages, "keywords (browser)", module.get_listing_details(title, detail_url, page))
+					finally:
+						await page.close()
+
+					# Only sites with server-rendered detail pages can be parsed over HTTP
+					if hasattr(module, "parse_listing_details"):
+						start = time.perf_counter()
+						response = await http.get(detail_url)
+						module.parse_listing_details(title, response.text)
+						stages.setdefault("keywords (http)", []).append((time.perf_counter() - start) * 1000)
+
+					# Full get_all_live, reading embedded/feed data vs scrolling the DOM
+					if site in STRUCTURED_SITES:
+						await _timed(stages, "live (structured)", module.get_all_live(context, structured=True))
+						await _timed(stages, "live (dom)", module.get_all_live(context, structured=False))
+
+				print(f"{site}: {count} listings")
+				for stage, timings in stages.items():
+					print(f"  {stage:<20} {statistics.median(timings):9.1f} ms")
+		finally:
+			await http.aclose()
+			await browser.close()
+			for site, module in SCRAPER_MODULES.items():
+				module.BASE_URL = live_urls[site]
+
+		if server.missing:
+			print(f"Warning: {server.missing} requests had no fixture")
+
+
+def _plan_nodes(plan: Dict) -> List[str]:
+	"""Flatten an EXPLAIN (FORMAT JSON) plan into its node types."""
+	nodes = [plan["Node Type"]]
+	for child in plan.get("Plans", []):
+		nodes += _plan_nodes(child)
+	return nodes
+
+
+async def _bench_search():
+	"""
+	EXPLAIN ANALYZE the /db_search queries on synthetic listing tables, with and without the GIN index.
+
+	Each size is loaded into its own table shaped like live_listings and every
+	query in SEARCH_QUERIES is run SEARCH_RUNS times, reporting the median
+	execution time and whether the plan used the search_document index.
+	"""
+	await db.pool.open()
+	try:
+		async with db.acquire() as conn:
+			for size in SEARCH_SIZES:
+				await conn.execute("DROP TABLE IF EXISTS bench_search_listings")
+				await conn.execute("CREATE TABLE bench_search_listings (LIKE live_listings INCLUDING DEFAULTS INCLUDING GENERATED)")
+				try:
+					await conn.execute("""
+						INSERT INTO bench_search_listings (url, title, time, price, price_cents, currency, year, source, scraped_at, keywords)
+						SELECT
+							'https://example.com/listing/' || i || '/',
+							'BaT: ' || (1960 + i % 64) || ' ' || ($1::text[])[1 + i % array_length($1, 1)] || ' #' || i,
+							NOW() + make_interval(mins => i % 10080),
+							'$' || (i * 137 % 250000),
+							(i * 137 % 250000) * 100,
+							'USD',
+							1960 + i % 64,
+							'bat',
+							NOW(),
+							to_tsvector('english', ($1::text[])[1 + i % array_length($1, 1)] || ' ' || (1960 + i % 64) || ' ' || i)
+						FROM generate_series(1, $2) AS i
+					""", SEARCH_MODELS, size)
+					await conn.execute("ANALYZE bench_search_listings")
+
+					for indexed in (False, True):
+						if indexed:
+							await conn.execute("CREATE INDEX bench_search_document ON bench_search_listings USING GIN (search_document)")
+							await conn.execute("ANALYZE bench_search_listings")
+
+						for name, args in SEARCH_QUERIES.items():
+							tsquery, terms = search_tsquery(args)
+							listing_query = ListingQuery(args, sorts=search_sorts(tsquery))
+							sql, params = listing_query.build(
+								"title, url, price, year, keywords", "bench_search_listings",
+								[f"search_document @@ {tsquery}"], [terms]
+							)
+
+							timings = []
+							for _ in range(SEARCH_RUNS):
+								explain = await conn.fetchval(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", *params)
+								result = json.loads(explain)[0]
+								timings.append(result["Execution Time"])
+							uses_index = "Bitmap Index Scan" in _plan_nodes(result["Plan"])
+
+							print(f"{size:>7} rows | {'GIN' if indexed else 'no index':<8} | {name:<6} "
+								f"{statistics.median(timings):8.2f} ms | {'index scan' if uses_index else 'sequential scan'}")
+				finally:
+					await conn.execute("DROP TABLE IF EXISTS bench_search_listings")
+	finally:
+		await db.pool.close()
+
+
+BENCHMARKS = {
+	"staging": _bench_staging,
+	"new_listings": _bench_new_listings,
+	"scrapers": _bench_scrapers,
+	"search": _bench_search
+}
+
+
+if __name__ == "__main__":
+	# Available benchmarks: "staging" and "new_listings" (require a reachable Postgres with the API's tables),
+	# "scrapers" (requires Chromium, runs against the fixture corpus in api/fixtures), "search" (requires Postgres)
+	name = sys.argv[1] if len(sys.argv) > 1 else "staging"
+	asyncio.run(BENCHMARKS[name]())
@@ -1,13 +1,19 @@
 from playwright.async_api import async_playwright, Page, BrowserContext
+from selectolax.parser import HTMLParser
 import re
+import os
 import asyncio
 import listing
+from infinite_scroll import scroll_until_stable
 from datetime import timezone, datetime, timedelta
-from typing import Dict, Optional, List
-from urllib.parse import quote
+from typing import Dict, Optional, List, Tuple
+from html import unescape
+from urllib.parse import quote, urljoin
 
 TIMEOUT = 15000
 BASE_URL = "https://bringatrailer.com"
+# Build live listings from the auction data embedded in the page instead of scrolling through cards
+USE_STRUCTURED_DATA = os.environ.get("LIVE_STRUCTURED_DATA", "true").lower() == "true"
 
 class BringATrailerScraper:
 	"""Scraper for Bring a Trailer auction listings."""
@@ -51,6 +57,12 @@ class BringATrailerScraper:
 		"""Clean bid string by removing currency prefix."""
 		return bid_str[4:] if bid_str.startswith("USD ") else bid_str
 	
+	@staticmethod
+	def _parse_bid(bid_str: str) -> Tuple[str, Optional[int], Optional[str]]:
+		"""Clean bid string and parse its amount in cents and currency, read before the prefix is removed."""
+		price_cents, currency = listing.parse_price(bid_str)
+		return BringATrailerScraper._clean_bid(bid_str), price_cents, currency
+	
 	@staticmethod
 	async def _extract_listings_data(page: Page) -> List[Dict]:
 		"""Extract listings data from page using JavaScript."""
@@ -67,6 +79,50 @@ class BringATrailerScraper:
 			}
 		""")
 	
+	@staticmethod
+	async def _extract_bootstrap_data(page: Page) -> Optional[List[Dict]]:
+		"""Read the auction list the page embeds as auctionsCurrentInitialData."""
+		return await page.evaluate("""
+			() => {
+				const data = window.auctionsCurrentInitialData;
+				return data && Array.isArray(data.items) ? data.items : null;
+			}
+		""")
+	
+	@staticmethod
+	def _parse_listing_keywords(html: str) -> Optional[List[str]]:
+		"""Parse keywords from server-rendered listing HTML, mirroring get_listing_details."""
+		tree = HTMLParser(html)
+		if tree.css_first('.column-groups') is None:
+			return None
+
+		keywords = []
+		for el in tree.css('.group-item-wrap .group-item')[:2]:
+			label = el.css_first('.group-title-label')
+			if label is not None:
+				value = ''
+				node = label.next
+				while node is not None:
+					if node.tag == '-text':
+						value += node.text()
+					node = node.next
+			else:
+				value = el.text()
+
+			# Keep only the part before the first parenthesis
+			value = value.split('(')[0].strip()
+			if value:
+				keywords.append(value)
+		return keywords
+	
+	@staticmethod
+	def _build_keywords(title: str, listing_keywords: List[str]) -> str:
+		"""Combine extracted keywords with the listing title."""
+		kw = []
+		kw.extend(listing_keywords)
+		kw.append(title)
+		return " ".join(kw)
+	
 	@staticmethod
 	def _process_listing_data(data: Dict, scrape_time: datetime) -> Optional[listing.Listing]:
 		"""Process raw listing data into Listing object."""
@@ -74,7 +130,7 @@ class BringATrailerScraper:
 			return None
 		
 		year = BringATrailerScraper._extract_year(data['title'])
-		bid = BringATrailerScraper._clean_bid(str(data['bid']))
+		bid, price_cents, currency = BringATrailerScraper._parse_bid(str(data['bid']))
 		
 		try:
 			# Extract end time from time remaining
@@ -91,16 +147,54 @@ class BringATrailerScraper:
 			data['image'], 
 			end_time, 
 			bid, 
-			year
+			year,
+			source="bat",
+			price_cents=price_cents,
+			currency=currency
+		)
+	
+	@staticmethod
+	def _process_bootstrap_item(item: Dict, scrape_time: datetime) -> Optional[listing.Listing]:
+		"""Process one auctionsCurrentInitialData item into a Listing object."""
+		if not item.get('title') or not item.get('url') or not item.get('timestamp_end'):
+			return None
+		if item.get('active') is False:
+			return None
+		
+		try:
+			end_time = datetime.fromtimestamp(int(item['timestamp_end']), timezone.utc)
+		except (TypeError, ValueError):
+			return None
+		if end_time <= scrape_time:
+			return None  # Remove ended auctions from results
+		
+		# Titles are HTML-escaped in the embedded data but not in the rendered cards
+		title = unescape(item['title']).strip()
+		year = BringATrailerScraper._extract_year(title)
+		bid, price_cents, currency = BringATrailerScraper._parse_bid(str(item.get('current_bid_formatted') or ''))
+		if isinstance(item.get('current_bid'), (int, float)):
+			price_cents = round(item['current_bid'] * 100)
+		image = urljoin(f"{BASE_URL}/", item['thumbnail_url']) if item.get('thumbnail_url') else ''
+		
+		return listing.Listing(
+			f"BaT: {title}", 
+			urljoin(f"{BASE_URL}/", item['url']), 
+			image, 
+			end_time, 
+			bid, 
+			year,
+			source="bat",
+			price_cents=price_cents,
+			currency=currency
 		)
 
-async def get_results(query: str, browser, debug: bool = False) -> Dict:
+async def get_results(query: str, page: Page, debug: bool = False) -> Dict:
 	"""
 	Fetches search results from Bring a Trailer for a given query.
 
 	Args:
 		query: The desired car to search, formatted as a URL-encoded string.
-		browser: Playwright async browser
+		page: Playwright async page, owned and closed by the caller
 		debug: Print debug information
 	
 	Returns:
@@ -113,7 +207,6 @@ async def get_results(query: str, browser, debug: bool = False) -> Dict:
 	if debug:
 		print(f"Searching: {search_url}")
 	
-	page = await browser.new_page()
 	try:
 		await page.goto(search_url, timeout=TIMEOUT)
 		
@@ -149,7 +242,7 @@ async def get_results(query: str, browser, debug: bool = False) -> Dict:
 		for data in listings_data:
 			processed = BringATrailerScraper._process_listing_data(data, scrape_time)
 			if processed:
-				results[processed.url] = processed.to_dict()
+				results[processed.url] = processed
 				
 				if debug:
 					print(processed)
@@ -160,24 +253,27 @@ async def get_results(query: str, browser, debug: bool = False) -> Dict:
 	except Exception as e:
 		print(f'Error fetching BaT results: {e}')
 		return {}
-	finally:
-		await page.close()
 
 
-async def get_all_live(context: BrowserContext, debug: bool = False) -> Dict:
+async def get_all_live(context: BrowserContext, debug: bool = False, structured: bool = USE_STRUCTURED_DATA) -> Dict:
 	"""
 	Fetches all live auctions from Bring a Trailer.
+
+	With structured enabled, listings are built from the auction data embedded in
+	the page, so a single page load is enough. If that data is missing the cards
+	are scrolled into view and read from the DOM as before.
 	
 	Args:
 		context: Playwright async browser context
 		debug: Print debug information
+		structured: Read the embedded auction data instead of scrolling
 	
 	Returns:
 		Dictionary of all live listings
 	"""
 	search_url = f"{BASE_URL}/auctions/"
 	page = await context.new_page()
-	
+
 	try:
 		await page.goto(search_url, timeout=TIMEOUT)
 
@@ -187,24 +283,37 @@ async def get_all_live(context: BrowserContext, debug: bool = False) -> Dict:
 						document.querySelector('#auctions_filtered_message_none')""",
 			timeout=TIMEOUT
 		)
-		
-		# Scroll to load all listings
-		await _scroll_to_load_all_listings(page)
-
-		# Extract and process listings
-		listings_data = await BringATrailerScraper._extract_listings_data(page)
-		
-		if debug:
-			print(f"Found {len(listings_data)} total listings")
 
+		items = await BringATrailerScraper._extract_bootstrap_data(page) if structured else None
 		scrape_time = datetime.now(timezone.utc)
+		if items is not None:
+			if debug:
+				print(f"Found {len(items)} listings in embedded auction data")
+			processed_listings = [
+				BringATrailerScraper._process_bootstrap_item(item, scrape_time) for item in items
+			]
+		else:
+			if structured:
+				print("BaT embedded auction data not found, falling back to scrolling")
+
+			# Scroll to load all listings
+			await _scroll_to_load_all_listings(page)
+
+			# Extract and process listings
+			listings_data = await BringATrailerScraper._extract_listings_data(page)
+			if debug:
+				print(f"Found {len(listings_data)} total listings")
+
+			scrape_time = datetime.now(timezone.utc)
+			processed_listings = [
+				BringATrailerScraper._process_listing_data(data, scrape_time) for data in listings_data
+			]
+
 		results = {}
-		
-		for data in listings_data:
-			processed = BringATrailerScraper._process_listing_data(data, scrape_time)
+		for processed in processed_listings:
 			if processed:
-				results[processed.url] = processed.to_dict()
-				
+				results[processed.url] = processed
+			
 				if debug:
 					print(processed)
 					print("-" * 50)
@@ -218,20 +327,9 @@ async def get_all_live(context: BrowserContext, debug: bool = False) -> Dict:
 		await page.close()
 
 
-async def _scroll_to_load_all_listings(page: Page, max_attempts: int = 25) -> None:
-	"""Scroll page to load all listings."""
-	for attempt in range(max_attempts):
-		count_before = await page.evaluate("document.querySelectorAll('.listing-card').length")
-		await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-		
-		try:
-			await page.wait_for_function(
-				f"document.querySelectorAll('.listing-card').length > {count_before}",
-				timeout=3000
-			)
-		except:
-			# No new listings loaded, we're done
-			break
+async def _scroll_to_load_all_listings(page: Page) -> Dict:
+	"""Scroll page until no more listing cards load."""
+	return await scroll_until_stable(page, '.listing-card', label="BaT")
 
 
 async def get_listing_details(title: str, url: str, page, debug: bool = False) -> None:
@@ -241,7 +339,7 @@ async def get_listing_details(title: str, url: str, page, debug: bool = False) -
 	Args:
 		title: The title of the listing
 		url: The URL of the listing
-		page: Playwright async page
+		page: Playwright async page, owned and closed by the caller
 		debug: Print debug information
 	Returns:
 		Keywords extracted from the listing
@@ -287,19 +385,38 @@ async def get_listing_details(title: str, url: str, page, debug: bool = False) -
 		""")
 
 		# Update listing with keywords
-		kw = []
-		kw.extend(listing_keywords)
-		kw.append(title)
+		kw = BringATrailerScraper._build_keywords(title, listing_keywords)
 		
 		if debug:
 			print(f"Keywords for {title}: {kw}")
 
-		return " ".join(kw)
+		return kw
 
 	except Exception as e:
 		print(f'Error fetching BaT details for {title}: {e}')
 
 
+def parse_listing_details(title: str, html: str, debug: bool = False) -> Optional[str]:
+	"""
+	Extracts keywords for a listing from its fetched HTML, without a browser.
+
+	Args:
+		title: The title of the listing
+		html: The listing page's server-rendered HTML
+		debug: Print debug information
+	Returns:
+		Keywords extracted from the listing, or None if the page needs JavaScript
+	"""
+	listing_keywords = BringATrailerScraper._parse_listing_keywords(html)
+	if listing_keywords is None:
+		return None
+
+	kw = BringATrailerScraper._build_keywords(title, listing_keywords)
+	if debug:
+		print(f"Keywords for {title}: {kw}")
+	return kw
+
+
 # Test functions
 async def _test_results():
 	"""Test the search results functionality."""
@@ -307,7 +424,8 @@ async def _test_results():
 		browser = await p.chromium.launch(headless=True)
 		try:
 			query = quote("911 991")
-			await get_results(query, browser, debug=True)
+			page = await browser.new_page()
+			await get_results(query, page, debug=True)
 		finally:
 			await browser.close()
 
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright, Browser, Playwright
+from typing import Dict, Optional
+from page_pool import PagePool
+
+# Browser config
+BROWSER_MAX_PAGES_PER_SITE = int(os.environ.get("BROWSER_MAX_PAGES_PER_SITE", 3))
+BROWSER_PAGE_MAX_USES = int(os.environ.get("BROWSER_PAGE_MAX_USES", 20))
+BROWSER_WARM_PAGES = int(os.environ.get("BROWSER_WARM_PAGES", 1))
+
+SITES = ('bat', 'pcar', 'cab')
+
+LAUNCH_ARGS = [
+	'--no-sandbox',
+	'--disable-setuid-sandbox',
+	'--disable-dev-shm-usage',
+	'--disable-accelerated-2d-canvas',
+	'--no-first-run',
+	'--no-zygote',
+	'--disable-gpu',
+	'--disable-web-security',
+	'--disable-features=VizDisplayCompositor'
+]
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+SEARCH_CONTEXT_OPTIONS = {
+	"user_agent": USER_AGENT,
+	"viewport": {'width': 1920, 'height': 1080},
+	"locale": 'en-US',
+	"timezone_id": 'America/New_York'
+}
+
+BLOCKED_RESOURCE_TYPES = ["image", "media", "font"]
+
+
+async def launch_browser(playwright: Playwright) -> Browser:
+	"""Launch headless Chromium with container-friendly flags."""
+	return await playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+
+
+async def block_resources(context) -> None:
+	"""Abort image, media and font requests to speed up scraping."""
+	await context.route(
+		"**/*",
+		lambda route, request: route.abort()
+		if request.resource_type in BLOCKED_RESOURCE_TYPES
+		else route.continue_()
+	)
+
+
+class BrowserPool:
+	"""Long-lived Chromium with one context and page pool per site."""
+
+	def __init__(self, sites=SITES, context_options: Dict = SEARCH_CONTEXT_OPTIONS,
+			max_pages: int = BROWSER_MAX_PAGES_PER_SITE, max_uses: int = BROWSER_PAGE_MAX_USES):
+		self.sites = sites
+		self.context_options = context_options
+		self.max_pages = max_pages
+		self.max_uses = max_uses
+		self._playwright: Optional[Playwright] = None
+		self._browser: Optional[Browser] = None
+		self._pools: Dict[str, PagePool] = {}
+		self._lock = asyncio.Lock()
+		self._stopping = False
+
+		# Metrics
+		self.launches = 0
+		self.crashes = 0
+
+	async def start(self, warm_pages: int = BROWSER_WARM_PAGES) -> None:
+		"""Start Playwright, launch the browser and warm up each site's pages."""
+		self._stopping = False
+		self._playwright = await async_playwright().start()
+		async with self._lock:
+			await self._launch(warm_pages)
+
+	async def _launch(self, warm_pages: int = 0) -> None:
+		browser = await launch_browser(self._playwright)
+		browser.on("disconnected", self._on_disconnected)
+
+		pools = {}
+		for site in self.sites:
+			context = await browser.new_context(**self.context_options)
+			await block_resources(context)
+			pools[site] = PagePool(context, self.max_pages, self.max_uses)
+			await pools[site].warm(warm_pages)
+
+		self._browser = browser
+		self._pools = pools
+		self.launches += 1
+		logging.info(f"Launched browser pool for {', '.join(self.sites)}")
+
+	def _on_disconnected(self, browser: Browser) -> None:
+		if not self._stopping:
+			self.crashes += 1
+			logging.warning("Browser disconnected unexpectedly, relaunching on next request")
+
+	async def _ensure_browser(self) -> None:
+		"""Relaunch the browser if it crashed or was closed underneath us."""
+		if self._browser is not None and self._browser.is_connected():
+			return
+		async with self._lock:
+			if self._browser is not None and self._browser.is_connected():
+				return
+			if self._playwright is None:
+				raise RuntimeError("Browser pool is not started")
+			await self._launch()
+
+	@asynccontextmanager
+	async def page(self, site: str):
+		"""Acquire a page on the given site's context."""
+		await self._ensure_browser()
+		async with self._pools[site].page() as page:
+			yield page
+
+	async def stop(self) -> None:
+		"""Close all pages, contexts and the browser."""
+		self._stopping = True
+		for pool in self._pools.values():
+			await pool.close()
+		if self._browser is not None and self._browser.is_connected():
+			await self._browser.close()
+		if self._playwright is not None:
+			await self._playwright.stop()
+		self._browser = None
+		self._playwright = None
+		self._pools = {}
+
+	def stats(self) -> Dict:
+		return {
+			"connected": bool(self._browser and self._browser.is_connected()),
+			"launches": self.launches,
+			"crashes": self.crashes,
+			"sites": {site: pool.stats() for site, pool in self._pools.items()}
+		}
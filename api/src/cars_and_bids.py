@@ -1,13 +1,18 @@
 from playwright.async_api import async_playwright, Page, BrowserContext
 import re
+import os
 import asyncio
 import listing
+from infinite_scroll import scroll_until_stable
 from datetime import timezone, datetime, timedelta
 from typing import Dict, Optional, List
-from urllib.parse import quote
+from urllib.parse import quote, urlsplit
 
 TIMEOUT = 15000
 BASE_URL = "https://carsandbids.com"
+AUCTIONS_FEED_PATH = "/v2/autos/auctions"
+# Build live listings from the auctions feed the home page loads instead of scrolling through cards
+USE_STRUCTURED_DATA = os.environ.get("LIVE_STRUCTURED_DATA", "true").lower() == "true"
 
 class CarsAndBidsScraper:
 	"""Scraper for Cars & Bids auction listings."""
@@ -83,6 +88,39 @@ class CarsAndBidsScraper:
 			}
 		""")
 	
+	@staticmethod
+	def _slugify(title: str) -> str:
+		"""Build the URL slug the site derives from an auction title."""
+		return re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-')
+	
+	@staticmethod
+	def _feed_item_path(item: Dict) -> str:
+		"""Path of an auction's page, from the feed item if it carries one, otherwise built from its id and title."""
+		if item.get('url'):
+			return urlsplit(item['url']).path
+		slug = item.get('slug') or CarsAndBidsScraper._slugify(item['title'].strip())
+		return f"/auctions/{item['id']}/{slug}"
+	
+	@staticmethod
+	def _card_paths(listings_data: List[Dict]) -> Dict[str, str]:
+		"""Map auction id -> page path for cards read by _extract_live_listings."""
+		paths = {}
+		for data in listings_data:
+			path = urlsplit(data['url']).path
+			match = re.match(r'/auctions/([^/]+)/', path)
+			if match:
+				paths[match.group(1)] = path
+		return paths
+	
+	@staticmethod
+	def _build_keywords(title: str, listing_keywords: Dict) -> str:
+		"""Combine extracted facts with the listing title."""
+		kw = [
+			listing_keywords.get("model", ""), 
+			title
+		]
+		return " ".join(filter(None, kw))
+	
 	@staticmethod
 	def _process_listing_data(data: Dict, scrape_time: datetime) -> Optional[listing.Listing]:
 		"""Process raw live listing data into Listing object."""
@@ -99,6 +137,7 @@ class CarsAndBidsScraper:
 		
 		url = f"{BASE_URL}{data['url']}"
 		title = f"C&B: {data['title']}"
+		price_cents, currency = listing.parse_price(data['bid'])
 		
 		return listing.Listing(
 			title, 
@@ -106,17 +145,58 @@ class CarsAndBidsScraper:
 			data['image'], 
 			end_time, 
 			data['bid'], 
-			year
+			year,
+			source="cab",
+			price_cents=price_cents,
+			currency=currency
+		)
+	
+	@staticmethod
+	def _process_feed_item(item: Dict, scrape_time: datetime) -> Optional[listing.Listing]:
+		"""
+		Process one auctions feed item into a Listing object, matching the card's URL and formatting.
+
+		The URL is the listing's key, so get_all_live checks the paths built here
+		against the rendered cards before using them.
+		"""
+		if not item.get('id') or not item.get('title') or not item.get('auction_end'):
+			return None
+		
+		try:
+			end_time = datetime.fromisoformat(item['auction_end'].replace('Z', '+00:00'))
+		except (AttributeError, ValueError):
+			return None
+		if end_time <= scrape_time:
+			return None  # The feed also lists recently ended auctions
+		
+		title = item['title'].strip()
+		year = CarsAndBidsScraper._extract_year(title)
+		url = f"{BASE_URL}{CarsAndBidsScraper._feed_item_path(item)}"
+		bid = f"${item['current_bid']:,}" if item.get('current_bid') is not None else ''
+		price_cents = item['current_bid'] * 100 if item.get('current_bid') is not None else None
+		photo = item.get('main_photo') or {}
+		image = f"https://{photo['base_url']}/{photo['path']}" if photo.get('base_url') and photo.get('path') else ''
+		
+		return listing.Listing(
+			f"C&B: {title}", 
+			url, 
+			image, 
+			end_time, 
+			bid, 
+			year,
+			source="cab",
+			price_cents=price_cents,
+			currency="USD" if price_cents is not None else None
 		)
 
 
-async def get_results(query: str, browser, debug: bool = False) -> Dict:
+async def get_results(query: str, page: Page, debug: bool = False) -> Dict:
 	"""
 	Fetches search results from Cars & Bids for a given query.
 
 	Args:
 		query: The desired car to search, formatted as a URL-encoded string.
-		browser: Playwright async browser
+		page: Playwright async page, owned and closed by the caller
 		debug: Print debug information
 	
 	Returns:
@@ -127,7 +207,6 @@ async def get_results(query: str, browser, debug: bool = False) -> Dict:
 	if debug:
 		print(f"Searching: {search_url}")
 
-	page = await browser.new_page()
 	try:
 		await page.goto(search_url, timeout=TIMEOUT)
 		await page.wait_for_function(
@@ -158,7 +237,7 @@ async def get_results(query: str, browser, debug: bool = False) -> Dict:
 		for data in listings_data:
 			processed = CarsAndBidsScraper._process_listing_data(data, scrape_time)
 			if processed:
-					results[processed.url] = processed.to_dict()
+					results[processed.url] = processed
 					
 					if debug:
 						print(processed)
@@ -169,26 +248,76 @@ async def get_results(query: str, browser, debug: bool = False) -> Dict:
 	except Exception as e:
 		print(f"Error scraping C&B auctions: {e}")
 		return {}
-	finally:
-		await page.close()
 
 
-async def get_all_live(context: BrowserContext, debug: bool = False) -> Dict:
+def _is_auctions_feed(response) -> bool:
+	return AUCTIONS_FEED_PATH in response.url and response.request.method == "GET" and response.ok
+
+
+async def _load_with_feed(page: Page, url: str) -> Optional[Dict]:
+	"""Navigate to url, returning the first auctions feed payload the page requests, if any."""
+	try:
+		async with page.expect_response(_is_auctions_feed, timeout=TIMEOUT) as response_info:
+			await page.goto(url, timeout=TIMEOUT)
+		response = await response_info.value
+		return await response.json()
+	except Exception as e:
+		print(f"C&B auctions feed not captured, falling back to scrolling: {e}")
+		return None
+
+
+async def _feed_matches_cards(page: Page, auctions: List[Dict]) -> bool:
+	"""Whether the paths built from the feed match the hrefs of the cards rendered so far."""
+	if not auctions:
+		return True
+	try:
+		await page.wait_for_selector('ul.auctions-list li.auction-item', timeout=TIMEOUT)
+	except Exception:
+		print("C&B auction cards not rendered, cannot check feed URLs, falling back to scrolling")
+		return False
+
+	cards = CarsAndBidsScraper._card_paths(await CarsAndBidsScraper._extract_live_listings(page))
+	checked = 0
+	for item in auctions:
+		if not item.get('id') or not item.get('title') or item['id'] not in cards:
+			continue
+		if CarsAndBidsScraper._feed_item_path(item) != cards[item['id']]:
+			print(f"C&B feed URL for {item['id']} does not match its card {cards[item['id']]}, falling back to scrolling")
+			return False
+		checked += 1
+	if not checked:
+		print("No C&B auction cards match the feed, falling back to scrolling")
+		return False
+	return True
+
+
+async def get_all_live(context: BrowserContext, debug: bool = False, structured: bool = USE_STRUCTURED_DATA) -> Dict:
 	"""
 	Fetches all live auctions from Cars & Bids.
 
+	With structured enabled, listings are built from the auctions feed response
+	the home page requests on load, so no scrolling is needed. If the feed is not
+	seen, only holds part of the auctions, or builds URLs that differ from the
+	first rendered cards, the cards are scrolled into view and read from the DOM
+	as before.
+
 	Args:
 		context: Playwright async browser context
 		debug: Print debug information
+		structured: Read the auctions feed instead of scrolling
 	
 	Returns:
 		Dictionary of all live listings
 	"""
 	search_url = BASE_URL
 	page = await context.new_page()
-	
+
 	try:
-		await page.goto(search_url, timeout=TIMEOUT)
+		if structured:
+			feed = await _load_with_feed(page, search_url)
+		else:
+			feed = None
+			await page.goto(search_url, timeout=TIMEOUT)
 		await page.wait_for_function(
 			"""() => {
 					return document.querySelector('ul.auctions-list') !== null ||
@@ -197,23 +326,42 @@ async def get_all_live(context: BrowserContext, debug: bool = False) -> Dict:
 			timeout=TIMEOUT
 		)
 
-		# Scroll to load all listings with improved logic
-		await _scroll_to_load_all_listings(page)
+		# A paged feed only covers the first batch of cards, so scroll for the rest
+		auctions = feed.get('auctions') if isinstance(feed, dict) else None
+		if auctions is not None and feed.get('count', len(auctions)) > len(auctions):
+			print(f"C&B auctions feed holds {len(auctions)} of {feed['count']} auctions, falling back to scrolling")
+			auctions = None
 
-		# Extract and process listings
-		listings_data = await CarsAndBidsScraper._extract_live_listings(page)
-		
-		if debug:
-			print(f"Found {len(listings_data)} auction listings")
+		# Listings are keyed on URL, so only trust the feed if its paths match the cards
+		if auctions is not None and not await _feed_matches_cards(page, auctions):
+			auctions = None
 
 		scrape_time = datetime.now(timezone.utc)
+		if auctions is not None:
+			if debug:
+				print(f"Found {len(auctions)} auctions in feed")
+			processed_listings = [
+				CarsAndBidsScraper._process_feed_item(item, scrape_time) for item in auctions
+			]
+		else:
+			# Scroll to load all listings
+			await _scroll_to_load_all_listings(page)
+
+			# Extract and process listings
+			listings_data = await CarsAndBidsScraper._extract_live_listings(page)
+			if debug:
+				print(f"Found {len(listings_data)} auction listings")
+
+			scrape_time = datetime.now(timezone.utc)
+			processed_listings = [
+				CarsAndBidsScraper._process_listing_data(data, scrape_time) for data in listings_data
+			]
+
 		results = {}
-		
-		for data in listings_data:
-			processed = CarsAndBidsScraper._process_listing_data(data, scrape_time)
+		for processed in processed_listings:
 			if processed:
-					results[processed.url] = processed.to_dict()
-					
+					results[processed.url] = processed
+				
 					if debug:
 						print(processed)
 						print("-" * 50)
@@ -227,29 +375,9 @@ async def get_all_live(context: BrowserContext, debug: bool = False) -> Dict:
 		await page.close()
 
 
-async def _scroll_to_load_all_listings(page: Page) -> None:
-	"""Scroll page to load all listings with controlled timing."""
-	await page.evaluate("""
-		() => {
-			return new Promise(resolve => {
-				let count = 0;
-				const scrollStep = window.innerHeight;
-				function scrollAndCheck() {
-					window.scrollBy(0, scrollStep);
-					setTimeout(() => {
-						const items = document.querySelectorAll('ul.auctions-list li.auction-item').length;
-						if (count < 50) { // Scroll 50 times, 10 page heights per second
-							count++;
-							scrollAndCheck();
-						} else {
-							resolve();
-						}
-					}, 100); // 10 page heights per second
-				}
-				scrollAndCheck();
-			});
-		}
-	""")
+async def _scroll_to_load_all_listings(page: Page) -> Dict:
+	"""Scroll page until no more auction items load."""
+	return await scroll_until_stable(page, 'ul.auctions-list li.auction-item', label="C&B")
 
 
 async def get_listing_details(title: str, url: str, page, debug: bool = False) -> None:
@@ -259,7 +387,7 @@ async def get_listing_details(title: str, url: str, page, debug: bool = False) -
 	Args:
 		title: The title of the listing
 		url: The URL of the listing
-		page: Playwright async page
+		page: Playwright async page, owned and closed by the caller
 		debug: Print debug information
 	Returns:
 		Keywords extracted from the listing
@@ -289,20 +417,15 @@ async def get_listing_details(title: str, url: str, page, debug: bool = False) -
 			}
 		""")
 
-		kw = [
-			listing_keywords.get("model", ""), 
-			title
-		]
+		kw = CarsAndBidsScraper._build_keywords(title, listing_keywords)
 
 		if debug:
 			print(f"Keywords for {title}: {kw}")
 
-		return " ".join(filter(None, kw))
+		return kw
 
 	except Exception as e:
 		print(f'Error fetching C&B details for {title}: {e}')
-	finally:
-		await page.close()
 
 
 # Test functions
@@ -331,7 +454,8 @@ async def _test_results():
 
 		try:
 			query = quote("997 911")
-			await get_results(query, browser, debug=True)
+			page = await browser.new_page()
+			await get_results(query, page, debug=True)
 		finally:
 			await browser.close()
 
@@ -0,0 +1,131 @@
+import asyncio
+import asyncpg
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from typing import Dict, Optional
+
+# Load environment variables
+load_dotenv()
+
+# Database config
+PG_CONN = {
+	"host": os.environ.get("PG_HOST"),
+	"database": os.environ.get("PG_DATABASE"),
+	"user": os.environ.get("PG_USER"),
+	"password": os.environ.get("PG_PASSWORD")
+}
+
+# Pool config
+PG_POOL_MIN_SIZE = int(os.environ.get("PG_POOL_MIN_SIZE", 2))
+PG_POOL_MAX_SIZE = int(os.environ.get("PG_POOL_MAX_SIZE", 10))
+PG_POOL_ACQUIRE_TIMEOUT = float(os.environ.get("PG_POOL_ACQUIRE_TIMEOUT", 10))
+PG_POOL_MAX_INACTIVE_LIFETIME = float(os.environ.get("PG_POOL_MAX_INACTIVE_LIFETIME", 300))
+PG_STATEMENT_CACHE_SIZE = int(os.environ.get("PG_STATEMENT_CACHE_SIZE", 100))
+
+
+class PoolUnavailableError(RuntimeError):
+	"""Raised when no connection could be acquired from the pool in time."""
+
+
+class DatabasePool:
+	"""Shared asyncpg connection pool with saturation metrics."""
+
+	def __init__(self, min_size: int = PG_POOL_MIN_SIZE, max_size: int = PG_POOL_MAX_SIZE,
+			acquire_timeout: float = PG_POOL_ACQUIRE_TIMEOUT):
+		self.min_size = min_size
+		self.max_size = max_size
+		self.acquire_timeout = acquire_timeout
+		self._pool: Optional[asyncpg.Pool] = None
+
+		# Saturation metrics
+		self.acquired = 0
+		self.timeouts = 0
+		self.waiting = 0
+		self.max_waiting = 0
+		self.total_wait_ms = 0.0
+		self.max_wait_ms = 0.0
+
+	async def open(self) -> None:
+		"""Create the underlying asyncpg pool."""
+		if self._pool is not None:
+			return
+		self._pool = await asyncpg.create_pool(
+			**PG_CONN,
+			min_size=self.min_size,
+			max_size=self.max_size,
+			max_inactive_connection_lifetime=PG_POOL_MAX_INACTIVE_LIFETIME,
+			statement_cache_size=PG_STATEMENT_CACHE_SIZE
+		)
+		logging.info(f"Opened Postgres pool (min={self.min_size}, max={self.max_size})")
+
+	async def close(self) -> None:
+		"""Close the pool, waiting for connections to be released."""
+		if self._pool is None:
+			return
+		pool, self._pool = self._pool, None
+		await pool.close()
+		logging.info("Closed Postgres pool")
+
+	@property
+	def is_open(self) -> bool:
+		return self._pool is not None
+
+	@asynccontextmanager
+	async def acquire(self):
+		"""Acquire a connection from the pool, recording wait time."""
+		if self._pool is None:
+			raise PoolUnavailableError("Database pool is not open")
+
+		self.waiting += 1
+		self.max_waiting = max(self.max_waiting, self.waiting)
+		start = time.perf_counter()
+		try:
+			conn = await self._pool.acquire(timeout=self.acquire_timeout)
+		except asyncio.TimeoutError:
+			self.timeouts += 1
+			raise PoolUnavailableError(
+				f"Timed out after {self.acquire_timeout}s waiting for a database connection"
+			)
+		finally:
+			self.waiting -= 1
+
+		wait_ms = (time.perf_counter() - start) * 1000
+		self.acquired += 1
+		self.total_wait_ms += wait_ms
+		self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+		try:
+			yield conn
+		finally:
+			await self._pool.release(conn)
+
+	def stats(self) -> Dict:
+		"""Return pool size and saturation metrics."""
+		size = self._pool.get_size() if self._pool else 0
+		idle = self._pool.get_idle_size() if self._pool else 0
+		return {
+			"open": self.is_open,
+			"min_size": self.min_size,
+			"max_size": self.max_size,
+			"size": size,
+			"idle": idle,
+			"in_use": size - idle,
+			"waiting": self.waiting,
+			"max_waiting": self.max_waiting,
+			"acquired": self.acquired,
+			"timeouts": self.timeouts,
+			"avg_wait_ms": round(self.total_wait_ms / self.acquired, 2) if self.acquired else 0.0,
+			"max_wait_ms": round(self.max_wait_ms, 2)
+		}
+
+
+# Process-wide pool shared by the API and the scheduler
+pool = DatabasePool()
+
+
+def acquire():
+	"""Acquire a connection from the shared pool."""
+	return pool.acquire()
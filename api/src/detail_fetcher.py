@@ -0,0 +1,84 @@
+import asyncio
+import httpx
+import logging
+import os
+from typing import Dict, Optional
+from browser_pool import USER_AGENT
+import bring_a_trailer, pcarmarket
+
+# HTTP client config
+HTTP_DETAIL_CONCURRENCY = int(os.environ.get("HTTP_DETAIL_CONCURRENCY", 8))
+HTTP_DETAIL_TIMEOUT = float(os.environ.get("HTTP_DETAIL_TIMEOUT", 15))
+
+# Sites whose detail pages are server-rendered. C&B renders its quick facts client-side,
+# so an HTTP fetch of its pages can never be parsed and those go straight to the browser.
+PARSERS = {
+	'bat': bring_a_trailer.parse_listing_details,
+	'pcar': pcarmarket.parse_listing_details
+}
+
+
+class HttpDetailFetcher:
+	"""Fetches listing detail pages over a pooled HTTP/2 client and parses keywords without a browser."""
+
+	def __init__(self, concurrency: int = HTTP_DETAIL_CONCURRENCY, timeout: float = HTTP_DETAIL_TIMEOUT):
+		self._client = httpx.AsyncClient(
+			http2=True,
+			timeout=timeout,
+			follow_redirects=True,
+			headers={"User-Agent": USER_AGENT, "Accept-Language": "en-US,en;q=0.9"},
+			limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+		)
+		self._semaphore = asyncio.Semaphore(concurrency)
+
+		# Metrics
+		self.parsed = 0
+		self.needs_browser = 0
+		self.errors = 0
+
+	async def __aenter__(self) -> "HttpDetailFetcher":
+		return self
+
+	async def __aexit__(self, *exc) -> None:
+		await self.close()
+
+	def supports(self, site: str) -> bool:
+		"""Whether the site's detail pages can be parsed without a browser."""
+		return site in PARSERS
+
+	async def get_keywords(self, site: str, title: str, url: str) -> Optional[str]:
+		"""
+		Return keywords for a listing, or None if the page has to be rendered in a browser.
+
+		Request and parse failures also return None so the caller can fall back to Playwright.
+		Sites without an HTTP parser return None without a request.
+		"""
+		if not self.supports(site):
+			self.needs_browser += 1
+			return None
+
+		try:
+			async with self._semaphore:
+				response = await self._client.get(url)
+			response.raise_for_status()
+			kw = PARSERS[site](title, response.text)
+		except Exception as e:
+			self.errors += 1
+			logging.debug(f"HTTP detail fetch failed for {url}: {e}")
+			return None
+
+		if kw is None:
+			self.needs_browser += 1
+		else:
+			self.parsed += 1
+		return kw
+
+	async def close(self) -> None:
+		await self._client.aclose()
+
+	def stats(self) -> Dict:
+		return {
+			"parsed": self.parsed,
+			"needs_browser": self.needs_browser,
+			"errors": self.errors
+		}
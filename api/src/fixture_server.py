@@ -0,0 +1,163 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from playwright.async_api import async_playwright
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from browser_pool import SEARCH_CONTEXT_OPTIONS, launch_browser, block_resources
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "fixtures")
+MANIFEST_FILE = "manifest.json"
+
+CONTENT_TYPES = {
+	".html": "text/html; charset=utf-8",
+	".json": "application/json"
+}
+
+
+def load_manifest(fixtures_dir: str = FIXTURES_DIR) -> Dict[str, Dict[str, str]]:
+	"""Load the site -> request path -> fixture file mapping."""
+	with open(os.path.join(fixtures_dir, MANIFEST_FILE)) as f:
+		return json.load(f)
+
+
+class FixtureServer:
+	"""
+	Local stand-in for the auction sites, serving the recorded fixture corpus.
+
+	Each site gets its own port, so root-relative links and XHR paths in the
+	fixtures resolve the same way they do on the live site. Pointing a scraper
+	module's BASE_URL at url(site) makes it load fixtures instead of the network.
+	Requests are matched on path and query first, then on path alone.
+	"""
+
+	def __init__(self, fixtures_dir: str = FIXTURES_DIR, port: int = 0):
+		self.fixtures_dir = fixtures_dir
+		self.manifest = load_manifest(fixtures_dir)
+		# Consecutive ports from the given one, or ephemeral ports if it is 0
+		self._servers = {
+			site: ThreadingHTTPServer(("127.0.0.1", port + i if port else 0), self._handler(site))
+			for i, site in enumerate(self.manifest)
+		}
+		self._threads = []
+
+		# Metrics
+		self.served = 0
+		self.missing = 0
+
+	def _handler(self, site: str):
+		server = self
+
+		class Handler(BaseHTTPRequestHandler):
+			def do_GET(self):
+				path = server.resolve(site, self.path)
+				if path is None:
+					server.missing += 1
+					self.send_error(404)
+					return
+
+				with open(path, "rb") as f:
+					body = f.read()
+				server.served += 1
+				self.send_response(200)
+				self.send_header("Content-Type", CONTENT_TYPES.get(os.path.splitext(path)[1], "application/octet-stream"))
+				self.send_header("Content-Length", str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+			def log_message(self, format, *args):
+				logging.debug(f"Fixture server ({site}): {format % args}")
+
+		return Handler
+
+	def resolve(self, site: str, request_path: str) -> Optional[str]:
+		"""Return the fixture file for a request on a site, or None if there is none."""
+		parts = urlsplit(request_path)
+		fixtures = self.manifest.get(site, {})
+		name = fixtures.get(f"{parts.path}?{parts.query}") if parts.query else None
+		name = name or fixtures.get(parts.path)
+		return os.path.join(self.fixtures_dir, name) if name else None
+
+	def url(self, site: str) -> str:
+		"""Base URL to substitute for a site's live BASE_URL."""
+		host, port = self._servers[site].server_address[:2]
+		return f"http://{host}:{port}"
+
+	def start(self) -> None:
+		for site, server in self._servers.items():
+			thread = threading.Thread(target=server.serve_forever, daemon=True)
+			thread.start()
+			self._threads.append(thread)
+			logging.info(f"Serving {site} fixtures on {self.url(site)}")
+
+	def stop(self) -> None:
+		for server in self._servers.values():
+			server.shutdown()
+			server.server_close()
+		for thread in self._threads:
+			thread.join()
+		self._threads = []
+
+	async def __aenter__(self) -> "FixtureServer":
+		self.start()
+		return self
+
+	async def __aexit__(self, *exc) -> None:
+		self.stop()
+
+
+async def record_fixture(site: str, url: str, fixtures_dir: str = FIXTURES_DIR) -> None:
+	"""
+	Save a live page's rendered HTML into the corpus and register it in the manifest.
+
+	The manifest key is the URL's path and query, so the stand-in server answers
+	the same request the scraper makes against the live site.
+	"""
+	parts = urlsplit(url)
+	key = f"{parts.path or '/'}?{parts.query}" if parts.query else parts.path or "/"
+	slug = key.strip("/").replace("/", "_").replace("?", "_").replace("=", "-").replace("&", "_") or "home"
+	name = f"{site}/{slug}.html"
+
+	async with async_playwright() as p:
+		browser = await launch_browser(p)
+		try:
+			context = await browser.new_context(**SEARCH_CONTEXT_OPTIONS)
+			await block_resources(context)
+			page = await context.new_page()
+			await page.goto(url, wait_until="networkidle")
+			html = await page.content()
+		finally:
+			await browser.close()
+
+	os.makedirs(os.path.join(fixtures_dir, site), exist_ok=True)
+	with open(os.path.join(fixtures_dir, name), "w") as f:
+		f.write(html)
+
+	manifest = load_manifest(fixtures_dir)
+	manifest.setdefault(site, {})[key] = name
+	with open(os.path.join(fixtures_dir, MANIFEST_FILE), "w") as f:
+		json.dump(manifest, f, indent=2)
+		f.write("\n")
+	print(f"Recorded {url} as {name} ({len(html)} bytes)")
+
+
+if __name__ == "__main__":
+	# Usage: python fixture_server.py serve [first port]
+	#        python fixture_server.py record <site> <url>
+	logging.basicConfig(level=logging.INFO)
+	command = sys.argv[1] if len(sys.argv) > 1 else "serve"
+	if command == "record":
+		asyncio.run(record_fixture(sys.argv[2], sys.argv[3]))
+	else:
+		server = FixtureServer(port=int(sys.argv[2]) if len(sys.argv) > 2 else 8800)
+		server.start()
+		for site in server.manifest:
+			print(f"{site}: {server.url(site)}")
+		try:
+			threading.Event().wait()
+		except KeyboardInterrupt:
+			server.stop()
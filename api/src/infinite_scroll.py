@@ -0,0 +1,88 @@
+import logging
+import os
+from playwright.async_api import Page
+from typing import Dict
+
+# Scroll config
+SCROLL_QUIET_MS = int(os.environ.get("SCROLL_QUIET_MS", 2000))
+SCROLL_NUDGE_MS = int(os.environ.get("SCROLL_NUDGE_MS", 250))
+SCROLL_MAX_SECONDS = int(os.environ.get("SCROLL_MAX_SECONDS", 120))
+
+# Scrolls to the bottom whenever the item count changes and resolves once it has
+# been stable for quietMs. While waiting, the page is nudged every nudgeMs in case
+# a scroll event was dropped or the loader only fires on movement.
+SCROLL_SCRIPT = """
+	({ selector, quietMs, nudgeMs, maxMs }) => new Promise(resolve => {
+		const start = performance.now();
+		const count = () => document.querySelectorAll(selector).length;
+		let items = count();
+		let scrolls = 0;
+		let quietTimer = null;
+
+		const toBottom = () => {
+			scrolls++;
+			window.scrollTo(0, document.body.scrollHeight);
+		};
+		const nudge = () => {
+			window.scrollBy(0, -1);
+			toBottom();
+		};
+		const finish = timedOut => {
+			observer.disconnect();
+			clearTimeout(quietTimer);
+			clearTimeout(maxTimer);
+			clearInterval(nudgeTimer);
+			resolve({ items: count(), ms: Math.round(performance.now() - start), scrolls, timedOut });
+		};
+		const restartQuiet = () => {
+			clearTimeout(quietTimer);
+			quietTimer = setTimeout(() => finish(false), quietMs);
+		};
+
+		const observer = new MutationObserver(() => {
+			const now = count();
+			if (now !== items) {
+				items = now;
+				toBottom();
+				restartQuiet();
+			}
+		});
+		observer.observe(document.body, { childList: true, subtree: true });
+
+		const maxTimer = setTimeout(() => finish(true), maxMs);
+		const nudgeTimer = setInterval(nudge, nudgeMs);
+		toBottom();
+		restartQuiet();
+	})
+"""
+
+
+async def scroll_until_stable(page: Page, selector: str, label: str = "page", quiet_ms: int = SCROLL_QUIET_MS,
+		nudge_ms: int = SCROLL_NUDGE_MS, max_seconds: int = SCROLL_MAX_SECONDS) -> Dict:
+	"""
+	Scroll an infinite-scroll page until the number of items matching selector stops changing.
+
+	New items are detected with a MutationObserver rather than by polling, so
+	scrolling continues as soon as a batch renders and stops once no item has
+	appeared for quiet_ms.
+
+	Args:
+		page: Playwright async page, already on the listings page
+		selector: CSS selector matching one listing card
+		label: Name used when logging the result
+		quiet_ms: How long the item count must be stable before stopping
+		nudge_ms: Interval between scroll nudges while waiting for more items
+		max_seconds: Upper bound on total scroll time
+	Returns:
+		Dictionary with the final item count, elapsed ms, scroll count and whether max_seconds was hit
+	"""
+	result = await page.evaluate(SCROLL_SCRIPT, {
+		"selector": selector,
+		"quietMs": quiet_ms,
+		"nudgeMs": nudge_ms,
+		"maxMs": max_seconds * 1000
+	})
+	if result["timedOut"]:
+		logging.warning(f"{label} scroll still loading items after {max_seconds}s, stopped at {result['items']}")
+	logging.info(f"{label} scroll loaded {result['items']} items in {result['ms']} ms ({result['scrolls']} scrolls)")
+	return result
@@ -0,0 +1,165 @@
+import asyncio
+import asyncpg
+import logging
+import os
+import db
+from playwright.async_api import BrowserContext, Page
+from typing import Dict, Optional
+from page_pool import PagePool
+from detail_fetcher import HttpDetailFetcher
+import bring_a_trailer, pcarmarket, cars_and_bids
+
+# Constants
+KEYWORD_BATCH_SIZE = int(os.environ.get("KEYWORD_BATCH_SIZE", 50))
+ASYNC_KEYWORD_SCRAPE_COUNT = int(os.environ.get("ASYNC_KEYWORD_SCRAPE_COUNT", 2))
+# Failed listings are retried after base * 2^(attempts - 1) seconds, capped at max
+KEYWORD_RETRY_BASE_SECONDS = int(os.environ.get("KEYWORD_RETRY_BASE_SECONDS", 300))
+KEYWORD_RETRY_MAX_SECONDS = int(os.environ.get("KEYWORD_RETRY_MAX_SECONDS", 86400))
+# Try a plain HTTP fetch of each detail page before falling back to Playwright
+KEYWORD_HTTP_FETCH = os.environ.get("KEYWORD_HTTP_FETCH", "true").lower() == "true"
+
+SCRAPERS = {
+	'bat': bring_a_trailer,
+	'pcar': pcarmarket,
+	'cab': cars_and_bids
+}
+
+# Title prefixes added by each scraper's _process_listing_data
+TITLE_PREFIXES = {
+	'BaT': 'bat',
+	'PCAR': 'pcar',
+	'C&B': 'cab'
+}
+
+# Pages opened per site, e.g. CAB_KEYWORD_SCRAPE_COUNT=4
+KEYWORD_SCRAPE_COUNTS = {
+	site: int(os.environ.get(f"{site.upper()}_KEYWORD_SCRAPE_COUNT", ASYNC_KEYWORD_SCRAPE_COUNT))
+	for site in SCRAPERS
+}
+
+
+def listing_site(title: str) -> Optional[str]:
+	"""Return the site key for a listing title, based on its prefix."""
+	for prefix, site in TITLE_PREFIXES.items():
+		if title.startswith(prefix):
+			return site
+	return None
+
+
+async def backlog_stats(conn) -> Dict:
+	"""Count live listings still waiting for keywords."""
+	row = await conn.fetchrow("""
+		SELECT
+			COUNT(*) FILTER (WHERE keyword_retry_at IS NULL OR keyword_retry_at <= NOW()) AS due,
+			COUNT(*) FILTER (WHERE keyword_retry_at > NOW()) AS deferred,
+			COUNT(*) FILTER (WHERE keyword_attempts > 0) AS failed_before
+		FROM live_listings
+		WHERE keywords IS NULL OR keywords = ''
+	""")
+	return dict(row)
+
+
+class KeywordEnricher:
+	"""Pipeline stage that extracts keywords for listings missing them."""
+
+	def __init__(self, contexts: Dict[str, BrowserContext], batch_size: int = KEYWORD_BATCH_SIZE,
+			scrape_counts: Dict[str, int] = KEYWORD_SCRAPE_COUNTS, http_fetch: bool = KEYWORD_HTTP_FETCH):
+		self.contexts = contexts
+		self.batch_size = batch_size
+		self.scrape_counts = scrape_counts
+		self.http_fetch = http_fetch
+
+	async def run(self) -> int:
+		"""Extract and store keywords for one batch. Returns the number of listings updated."""
+		async with db.acquire() as conn:
+			# Get listings that need keyword extraction and are not backing off,
+			# soonest-ending first
+			no_keywords = await conn.fetch("""
+				SELECT url, title, image, time, price, year, scraped_at, keywords
+				FROM live_listings
+				WHERE (keywords IS NULL OR keywords = '')
+				AND (keyword_retry_at IS NULL OR keyword_retry_at <= NOW())
+				ORDER BY time ASC NULLS LAST
+				LIMIT $1;
+			""", self.batch_size)
+
+		listings = [(listing_site(row["title"]), row) for row in no_keywords]
+		listings = [(site, row) for site, row in listings if site in self.contexts]
+		if not listings:
+			return 0
+
+		# One bounded page pool per site, on that site's own context
+		sites = {site for site, _ in listings}
+		pools = {
+			site: PagePool(self.contexts[site], self.scrape_counts[site])
+			for site in sites
+		}
+
+		fetcher = HttpDetailFetcher() if self.http_fetch else None
+		try:
+			extraction_results = await asyncio.gather(*(
+				self._extract(fetcher, pools[site], site, row) for site, row in listings
+			), return_exceptions=True)
+		finally:
+			for pool in pools.values():
+				await pool.close()
+			if fetcher is not None:
+				logging.info(f"HTTP keyword fetch: {fetcher.stats()}")
+				await fetcher.close()
+
+		# Split valid updates from listings that need to back off
+		updates = []
+		failed_urls = []
+		for (_, row), result in zip(listings, extraction_results):
+			if result and not isinstance(result, Exception):
+				updates.append((row["url"], result))
+			else:
+				failed_urls.append(row["url"])
+
+		async with db.acquire() as conn:
+			if updates:
+				await conn.executemany("""
+					UPDATE live_listings
+					SET keywords = to_tsvector('english', $2)
+					WHERE url = $1
+				""", updates)
+				logging.info(f"Updated keywords for {len(updates)} listings")
+
+			if failed_urls:
+				await conn.execute("""
+					UPDATE live_listings
+					SET keyword_attempts = keyword_attempts + 1,
+						keyword_retry_at = NOW() + make_interval(
+							secs => LEAST($2 * power(2, keyword_attempts), $3)
+						)
+					WHERE url = ANY($1::text[])
+				""", failed_urls, KEYWORD_RETRY_BASE_SECONDS, KEYWORD_RETRY_MAX_SECONDS)
+				logging.info(f"Deferred keyword extraction for {len(failed_urls)} listings")
+
+			backlog = await backlog_stats(conn)
+		logging.info(f"Keyword backlog: {backlog['due']} due, {backlog['deferred']} backing off")
+		return len(updates)
+
+	async def _extract(self, fetcher: Optional[HttpDetailFetcher], pool: PagePool, site: str,
+			listing: asyncpg.Record) -> Optional[str]:
+		"""Extract keywords over HTTP if possible, otherwise on a pooled browser page."""
+		if fetcher is not None and fetcher.supports(site):
+			kw = await fetcher.get_keywords(site, listing["title"], listing["url"])
+			if kw:
+				logging.info(f"Extracted keywords for {listing['title']} over HTTP")
+				return kw
+
+		async with pool.page() as page:
+			return await self._extract_keywords_for_listing(site, listing, page)
+
+	async def _extract_keywords_for_listing(self, site: str, listing: asyncpg.Record, page: Page) -> Optional[str]:
+		"""Extract keywords for a single listing using the provided page."""
+		title = listing["title"]
+		try:
+			kw = await SCRAPERS[site].get_listing_details(title, listing["url"], page)
+			if kw:
+				logging.info(f"Extracted keywords for {title}")
+				return kw
+		except Exception as e:
+			logging.error(f"Error extracting keywords for {title}: {e}")
+		return None
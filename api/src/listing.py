@@ -1,12 +1,61 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Tuple
+
+_PRICE_NUMBER = re.compile(r'\d[\d,.]*')
+_CURRENCY_CODE = re.compile(r'\b([A-Z]{3})\b')
+CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP"}
+# ISO 4217 codes accepted in a price, so words like "BID" are not read as a currency
+CURRENCY_CODES = frozenset({
+	"USD", "EUR", "GBP", "CAD", "AUD", "NZD", "CHF", "JPY", "SEK", "NOK",
+	"DKK", "MXN", "HKD", "SGD", "AED", "ZAR", "CNY"
+})
+
+
+def parse_price(price: Optional[str]) -> Tuple[Optional[int], Optional[str]]:
+	"""
+	Parse a displayed price like "$42,000" or "USD $42,000" into integer cents and a currency code.
+
+	Commas group thousands. A dot followed by exactly three digits does too, as in
+	"€12.500", otherwise it is the decimal point. Returns (None, None) for prices
+	without an amount, such as "No bids".
+	"""
+	match = _PRICE_NUMBER.search(price or "")
+	if match is None:
+		return None, None
+	groups = match.group(0).rstrip(",.").replace(",", "").split(".")
+	if len(groups) > 1 and len(groups[-1]) != 3:
+		whole, fraction = "".join(groups[:-1]), groups[-1][:2]
+	else:
+		whole, fraction = "".join(groups), ""
+	cents = int(whole) * 100 + int(fraction.ljust(2, "0") if fraction else 0)
+
+	code = next((c for c in _CURRENCY_CODE.findall(price) if c in CURRENCY_CODES), None)
+	if code is not None:
+		return cents, code
+	symbol = next((c for s, c in CURRENCY_SYMBOLS.items() if s in price), None)
+	return cents, symbol
+
+
+@dataclass(slots=True)
 class Listing:
-	def __init__(self, title: str, url: str, image: str, time, price: str, year: int, keywords=None):
-		self.title 	= title
-		self.url 	= url
-		self.image 	= image
-		self.time 	= time
-		self.price 	= price
-		self.year 	= year
-		self.keywords = keywords
+	title: str
+	url: str
+	image: str
+	time: datetime
+	price: str
+	year: Optional[int]
+	keywords: Optional[str] = None
+	source: Optional[str] = None
+	# Parsed from price when the scraper does not provide them
+	price_cents: Optional[int] = None
+	currency: Optional[str] = None
+
+	def __post_init__(self):
+		if self.price_cents is None:
+			self.price_cents, parsed_currency = parse_price(self.price)
+			self.currency = self.currency or parsed_currency
 
 	def __str__(self):
 		return f"Title: {self.title}\nURL: {self.url}\nCurrent Bid: {self.price}\nEnd Time (UTC): {self.time}"
@@ -21,4 +70,9 @@ class Listing:
 			"price": self.price,
 			"year": self.year,
 			"keywords": self.keywords
-		}
\ No newline at end of file
+		}
+
+	def to_record(self, scraped_at: datetime) -> Tuple:
+		"""Row for a site's staging table, in the scheduler's STAGING_COLUMNS order."""
+		return (self.url, self.title, self.image, self.time, self.price,
+			self.price_cents, self.currency, self.year, self.source, scraped_at)
@@ -0,0 +1,199 @@
+import base64
+import json
+import os
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from listing import CURRENCY_CODES
+
+# Page size config
+LISTINGS_DEFAULT_PAGE_SIZE = int(os.environ.get("LISTINGS_DEFAULT_PAGE_SIZE", 50))
+LISTINGS_MAX_PAGE_SIZE = int(os.environ.get("LISTINGS_MAX_PAGE_SIZE", 200))
+
+SOURCES = ('bat', 'pcar', 'cab')
+
+# Sort key -> (SQL expression, direction). NULLs are mapped to a sentinel so
+# (expression, url) is totally ordered for keyset pagination, and each
+# expression has a matching (expression, url) index created at startup.
+SORT_EXPRESSIONS = {
+	"time": "COALESCE(time, 'infinity'::timestamptz)",
+	"price": "COALESCE(price_cents, -1)",
+	"year": "COALESCE(year, 0)"
+}
+SORTS = {
+	**{key: (expression, "ASC") for key, expression in SORT_EXPRESSIONS.items()},
+	**{f"-{key}": (expression, "DESC") for key, expression in SORT_EXPRESSIONS.items()}
+}
+
+# Generated search_document column of live_listings and closed_listings. Title words
+# outrank extracted model/trim keywords, which outrank the year and source site.
+SEARCH_DOCUMENT = """
+	setweight(to_tsvector('english', coalesce(title, '')), 'A')
+	|| setweight(coalesce(keywords, ''::tsvector), 'B')
+	|| setweight(to_tsvector('simple', coalesce(year::text, '') || ' ' || coalesce(source, '')), 'C')
+"""
+
+# /db_search status filter values, "all" searches live and closed listings
+SEARCH_STATUSES = ('live', 'closed', 'all')
+
+
+def prefix_tsquery(query: str) -> Optional[str]:
+	"""
+	Build a to_tsquery string that matches every search term as a prefix, e.g. "99 carrera" -> "99:* & carrera:*".
+
+	Terms are reduced to letters and digits, so user input cannot inject tsquery operators.
+	Returns None if the query has no searchable terms.
+	"""
+	terms = re.findall(r"[a-z0-9]+", (query or "").lower())
+	return " & ".join(f"{term}:*" for term in terms) or None
+
+
+def search_tsquery(args) -> Tuple[str, Optional[str]]:
+	"""
+	Return the tsquery SQL for a search request and the value to bind as its $1.
+
+	Terms are prefix-matched by default, so "99" finds 991 and 997 models;
+	prefix=false falls back to plain word matching.
+	"""
+	query = str(args.get("query")).lower()
+	if args.get("prefix", "true").lower() == "false":
+		return "plainto_tsquery('english', $1)", query
+	return "to_tsquery('english', $1)", prefix_tsquery(query)
+
+
+def search_sorts(tsquery: str) -> Dict[str, Tuple[str, str]]:
+	"""SORTS plus a best-match-first rank sort, which only applies to full-text searches."""
+	return {**SORTS, "rank": (f"ts_rank(search_document, {tsquery})", "DESC")}
+
+
+class InvalidQueryError(ValueError):
+	"""Raised for malformed filter, sort or cursor parameters."""
+
+
+def search_status(args) -> str:
+	"""Return the status filter of a search request, live listings only by default."""
+	status = (args.get("status") or "live").lower()
+	if status not in SEARCH_STATUSES:
+		raise InvalidQueryError(f"Unknown status {status}, expected one of {', '.join(SEARCH_STATUSES)}")
+	return status
+
+
+def _int_arg(args, name: str) -> Optional[int]:
+	value = args.get(name)
+	if value in (None, ""):
+		return None
+	try:
+		return int(value)
+	except ValueError:
+		raise InvalidQueryError(f"{name} must be an integer")
+
+
+def _encode_cursor(sort_value, url: str) -> str:
+	if isinstance(sort_value, datetime):
+		sort_value = sort_value.isoformat()
+	raw = json.dumps([sort_value, url]).encode()
+	return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str) -> Tuple:
+	try:
+		raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+		sort_value, url = json.loads(raw)
+		if sort.lstrip("-") == "time":
+			sort_value = datetime.fromisoformat(sort_value)
+		elif not isinstance(sort_value, (int, float)):
+			raise ValueError("sort value must be a number")
+		if not isinstance(url, str):
+			raise ValueError("url must be a string")
+		return sort_value, url
+	except Exception:
+		raise InvalidQueryError("cursor is invalid for this sort")
+
+
+class ListingQuery:
+	"""
+	Filters, sort order and keyset pagination for listing endpoints, parsed from request args.
+
+	Supported args: year_min, year_max, price_min, price_max (whole currency units),
+	currency (ISO 4217 code), source (comma-separated site keys), ending_before (ISO 8601),
+	sort, limit and cursor. Price bounds compare amounts across currencies unless currency is given.
+	"""
+
+	def __init__(self, args, default_sort: str = "-time", sorts: Dict[str, Tuple[str, str]] = SORTS):
+		self.year_min = _int_arg(args, "year_min")
+		self.year_max = _int_arg(args, "year_max")
+		self.price_min = _int_arg(args, "price_min")
+		self.price_max = _int_arg(args, "price_max")
+
+		self.currency = (args.get("currency") or "").strip().upper() or None
+		if self.currency is not None and self.currency not in CURRENCY_CODES:
+			raise InvalidQueryError(f"Unknown currency {self.currency}, expected an ISO 4217 code like USD")
+
+		sources = args.get("source")
+		self.sources = [s.strip().lower() for s in sources.split(",") if s.strip()] if sources else []
+		unknown = [s for s in self.sources if s not in SOURCES]
+		if unknown:
+			raise InvalidQueryError(f"Unknown source {unknown[0]}, expected one of {', '.join(SOURCES)}")
+
+		ending_before = args.get("ending_before")
+		try:
+			self.ending_before = datetime.fromisoformat(ending_before) if ending_before else None
+		except ValueError:
+			raise InvalidQueryError("ending_before must be an ISO 8601 timestamp")
+
+		self.sort = args.get("sort") or default_sort
+		if self.sort not in sorts:
+			raise InvalidQueryError(f"Unknown sort {self.sort}, expected one of {', '.join(sorts)}")
+		self.sort_expression, self.direction = sorts[self.sort]
+
+		# Results are only paginated when the client asks for a page
+		self.paginated = "limit" in args or "cursor" in args
+		limit = _int_arg(args, "limit")
+		self.limit = min(max(limit or LISTINGS_DEFAULT_PAGE_SIZE, 1), LISTINGS_MAX_PAGE_SIZE)
+		self.cursor = _decode_cursor(args["cursor"], self.sort) if args.get("cursor") else None
+
+	def build(self, columns: str, table: str, conditions: List[str] = None, params: List = None) -> Tuple[str, List]:
+		"""Return the SELECT statement and its parameters, with the sort key selected as sort_key."""
+		conditions = list(conditions or [])
+		params = list(params or [])
+
+		def param(value) -> str:
+			params.append(value)
+			return f"${len(params)}"
+
+		if self.year_min is not None:
+			conditions.append(f"year >= {param(self.year_min)}")
+		if self.year_max is not None:
+			conditions.append(f"year <= {param(self.year_max)}")
+		if self.price_min is not None:
+			conditions.append(f"price_cents >= {param(self.price_min * 100)}")
+		if self.price_max is not None:
+			conditions.append(f"price_cents <= {param(self.price_max * 100)}")
+		if self.currency is not None:
+			conditions.append(f"currency = {param(self.currency)}")
+		if self.sources:
+			conditions.append(f"source = ANY({param(self.sources)}::text[])")
+		if self.ending_before is not None:
+			conditions.append(f"time <= {param(self.ending_before)}")
+		if self.cursor is not None:
+			op = ">" if self.direction == "ASC" else "<"
+			sort_value, url = self.cursor
+			conditions.append(f"({self.sort_expression}, url) {op} ({param(sort_value)}, {param(url)})")
+
+		sql = f"SELECT {columns}, {self.sort_expression} AS sort_key FROM {table}"
+		if conditions:
+			sql += " WHERE " + " AND ".join(conditions)
+		sql += f" ORDER BY {self.sort_expression} {self.direction}, url {self.direction}"
+		if self.paginated:
+			# One extra row tells us whether there is a next page
+			sql += f" LIMIT {param(self.limit + 1)}"
+		return sql, params
+
+	def page(self, rows: List) -> Tuple[List, Optional[str]]:
+		"""Trim the extra row fetched by build() and return the rows and the next page's cursor."""
+		if not self.paginated or len(rows) <= self.limit:
+			return rows, None
+		rows = rows[:self.limit]
+		last = rows[-1]
+		return rows, _encode_cursor(last["sort_key"], last["url"])
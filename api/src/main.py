@@ -1,8 +1,14 @@
-from run_all import run_search_scrapers
+from run_all import run_search_scrapers, search_flights
 from scheduler import run_scrapers
+from browser_pool import BrowserPool
+from search_cache import SearchCache
+from keyword_enricher import backlog_stats, TITLE_PREFIXES
+from price_history import MODEL_EXPRESSION, ensure_bid_partitions, refresh_price_stats, get_price_stats, normalize_model
+from listing import parse_price, CURRENCY_CODES
+from listing_query import ListingQuery, InvalidQueryError, SOURCES, SORT_EXPRESSIONS, SEARCH_DOCUMENT, search_tsquery, search_sorts, search_status
 from quart_cors import cors
 from quart import Quart, request, jsonify, session
-import asyncpg
+import db
 import bcrypt
 import re
 import os
@@ -15,12 +21,9 @@ load_dotenv()
 app = Quart(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "fallback-secret")
 
-PG_CONN = {
-	"host": os.environ.get("PG_HOST"),
-	"database": os.environ.get("PG_DATABASE"),
-	"user": os.environ.get("PG_USER"),
-	"password": os.environ.get("PG_PASSWORD")
-}
+# Chromium is launched once per process and shared by all /search requests
+browser_pool = BrowserPool()
+search_cache = SearchCache()
 
 app = cors(app, allow_origin="http://localhost:5173", allow_credentials=True)
 
@@ -60,29 +63,23 @@ async def check_password(password, password_hash):
 
 async def find_user_by_email_or_username(email_or_username):
 	"""Find user by email or username"""
-	conn = await asyncpg.connect(**PG_CONN)
-	try:
+	async with db.acquire() as conn:
 		user = await conn.fetchrow("""
 			SELECT id, email, username, password_hash, created_at, is_active
 			FROM users 
 			WHERE email = $1 OR username = $2
 		""", email_or_username.lower(), email_or_username)
 		return user
-	finally:
-		await conn.close()
 
 async def get_user_by_id(user_id):
 	"""Get user by ID"""
-	conn = await asyncpg.connect(**PG_CONN)
-	try:
+	async with db.acquire() as conn:
 		user = await conn.fetchrow("""
 			SELECT id, email, username, password_hash, created_at, is_active
 			FROM users 
 			WHERE id = $1
 		""", user_id)
 		return user
-	finally:
-		await conn.close()
 
 async def create_user(email, username, password):
 	"""Create new user with validation"""
@@ -97,8 +94,7 @@ async def create_user(email, username, password):
 	if len(username.strip()) < 3 or len(username.strip()) > 50:
 		raise ValueError("Username must be between 3 and 50 characters")
 	
-	conn = await asyncpg.connect(**PG_CONN)
-	try:
+	async with db.acquire() as conn:
 		# Check if user already exists
 		existing = await conn.fetchrow("""
 			SELECT id FROM users WHERE email = $1 OR username = $2
@@ -126,9 +122,6 @@ async def create_user(email, username, password):
 			FROM users WHERE id = $1
 		""", user_id)
 		return user
-		
-	finally:
-		await conn.close()
 
 def login_required(f):
 	"""Decorator to require login for protected routes"""
@@ -261,11 +254,8 @@ async def delete_user():
 			return jsonify({'error': 'Invalid password'}), 401
 		
 		# Delete user
-		conn = await asyncpg.connect(**PG_CONN)
-		try:
+		async with db.acquire() as conn:
 			await conn.execute("DELETE FROM users WHERE id = $1", user_id)
-		finally:
-			await conn.close()
 		
 		# Clear session
 		session.clear()
@@ -281,11 +271,47 @@ async def logout():
 	session.clear()
 	return jsonify({'message': 'Logged out successfully'}), 200
 
+# Listing helper functions
+async def claim_migration(conn, name):
+	"""Record a one-off migration as applied, returning True only the first time"""
+	return await conn.fetchval(
+		"INSERT INTO schema_migrations (name) VALUES ($1) ON CONFLICT DO NOTHING RETURNING TRUE", name
+	) is not None
+
+async def backfill_prices(conn, table, reparse=False):
+	"""
+	Parse price_cents and currency from the price text of rows that lack them, returning the number updated.
+
+	With reparse, rows parsed before parse_price rejected non-ISO codes and read "€12.500" as 12.50 are parsed again too.
+	"""
+	condition = "price_cents IS NULL"
+	params = []
+	if reparse:
+		condition = "(price_cents IS NULL OR currency <> ALL($1::text[]) OR price ~ '\\.[0-9]{3}')"
+		params = [list(CURRENCY_CODES)]
+	rows = await conn.fetch(f"""
+		SELECT DISTINCT url, price, price_cents, currency FROM {table}
+		WHERE price ~ '[0-9]' AND {condition}
+	""", *params)
+	updates = []
+	for row in rows:
+		parsed = parse_price(row["price"])
+		if parsed != (row["price_cents"], row["currency"]):
+			updates.append((row["url"], row["price"], *parsed))
+	await conn.executemany(f"""
+		UPDATE {table}
+		SET price_cents = $3, currency = $4
+		WHERE url = $1 AND price = $2
+	""", updates)
+	return len(updates)
+
 @app.before_serving
 async def startup():
-	"""Create user and listing tables"""
-	conn = await asyncpg.connect(**PG_CONN)
-	try:
+	"""Open the database and browser pools and create user and listing tables"""
+	await db.pool.open()
+	await browser_pool.start()
+
+	async with db.acquire() as conn:
 		# Users
 		await conn.execute("""
 			CREATE TABLE IF NOT EXISTS users (
@@ -314,9 +340,13 @@ async def startup():
 			)
 		""")
 
-		# Temp listings
+		# Keyword extraction retry state, see keyword_enricher
+		await conn.execute("ALTER TABLE live_listings ADD COLUMN IF NOT EXISTS keyword_attempts INTEGER NOT NULL DEFAULT 0")
+		await conn.execute("ALTER TABLE live_listings ADD COLUMN IF NOT EXISTS keyword_retry_at TIMESTAMP WITH TIME ZONE")
+
+		# Template for the per-site staging tables, rebuilt every sweep so there is no point WAL-logging them
 		await conn.execute("""
-			CREATE TABLE IF NOT EXISTS temp_listings (
+			CREATE UNLOGGED TABLE IF NOT EXISTS temp_listings (
 				url TEXT PRIMARY KEY,
 				title TEXT,
 				image TEXT,
@@ -327,6 +357,8 @@ async def startup():
 				keywords TSVECTOR
 			)
 		""")
+		# Convert staging tables created before it was unlogged
+		await conn.execute("ALTER TABLE temp_listings SET UNLOGGED")
 
 		# Closed listings
 		await conn.execute("""
@@ -341,6 +373,15 @@ async def startup():
 			)
 		""")
 
+		# Last time each scrape source was merged into live_listings. Rows only
+		# get a new scraped_at when their price or end time changes.
+		await conn.execute("""
+			CREATE TABLE IF NOT EXISTS scrape_status (
+				source TEXT PRIMARY KEY,
+				last_seen_at TIMESTAMP WITH TIME ZONE
+			)
+		""")
+
 		# Saved listings
 		await conn.execute("""
 			CREATE TABLE IF NOT EXISTS saved_listings (
@@ -355,62 +396,235 @@ async def startup():
 				PRIMARY KEY (user_id, url)
 			)
 		""")
-	finally:
-		await conn.close()
+
+		# One-off migrations that have been applied, so startup does not repeat them
+		await conn.execute("""
+			CREATE TABLE IF NOT EXISTS schema_migrations (
+				name TEXT PRIMARY KEY,
+				applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+			)
+		""")
+
+		# Numeric price parsed by the scrapers, so price filters and sorts can use an index.
+		# Rows stored before these columns existed are backfilled from the price text.
+		for table in ("live_listings", "temp_listings", "closed_listings", "saved_listings"):
+			await conn.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS price_cents BIGINT")
+			await conn.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS currency TEXT")
+		async with conn.transaction():
+			# Rows parsed by the old price parser are parsed again once
+			reparse = await claim_migration(conn, "reparse_prices")
+			for table in ("live_listings", "saved_listings"):
+				await backfill_prices(conn, table, reparse)
+			closed_prices_backfilled = await backfill_prices(conn, "closed_listings", reparse)
+		await conn.execute("CREATE INDEX IF NOT EXISTS idx_live_listings_price_cents ON live_listings(price_cents)")
+		await conn.execute("CREATE INDEX IF NOT EXISTS idx_closed_listings_price_cents ON closed_listings(price_cents)")
+
+		# Source site, backfilled from the title prefix each scraper adds
+		for table in ("live_listings", "temp_listings", "closed_listings"):
+			await conn.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS source TEXT")
+		for table in ("live_listings", "closed_listings"):
+			for prefix, site in TITLE_PREFIXES.items():
+				await conn.execute(f"UPDATE {table} SET source = $1 WHERE source IS NULL AND title LIKE $2", site, f"{prefix}:%")
+
+		# One staging table per site, so each site's scrape is merged on its own (see
+		# scheduler.staging_table). Columns added to temp_listings must be added to these too.
+		for site in SOURCES:
+			await conn.execute(f"CREATE UNLOGGED TABLE IF NOT EXISTS temp_listings_{site} (LIKE temp_listings INCLUDING ALL)")
+		# Heartbeats are recorded per source now
+		await conn.execute("DELETE FROM scrape_status WHERE source = 'all'")
+
+		# Keyset pagination indexes, one per ListingQuery sort expression, plus source-scoped time order
+		for key, expression in SORT_EXPRESSIONS.items():
+			await conn.execute(f"CREATE INDEX IF NOT EXISTS idx_live_listings_{key}_url ON live_listings (({expression}), url)")
+		await conn.execute(f"CREATE INDEX IF NOT EXISTS idx_live_listings_source_time_url ON live_listings (source, ({SORT_EXPRESSIONS['time']}), url)")
+
+		# Search document over title, extracted keywords, year and source. Postgres keeps it in
+		# step with keyword extraction, and closed listings keep theirs, so history stays searchable.
+		for table in ("live_listings", "closed_listings"):
+			await conn.execute(f"""
+				ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_document TSVECTOR
+				GENERATED ALWAYS AS ({SEARCH_DOCUMENT}) STORED
+			""")
+			await conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_search_document ON {table} USING GIN (search_document)")
+			# Superseded by the search_document index
+			await conn.execute(f"DROP INDEX IF EXISTS idx_{table}_keywords")
+
+		# Live and closed listings as one searchable relation, see /db_search
+		await conn.execute("""
+			CREATE OR REPLACE VIEW search_listings AS
+			SELECT title, url, image, time, price, price_cents, currency, year, source, keywords, search_document,
+				GREATEST(scraped_at, (SELECT last_seen_at FROM scrape_status s WHERE s.source = live_listings.source)) AS scraped_at,
+				'live'::text AS status
+			FROM live_listings
+			UNION ALL
+			SELECT title, url, image, closed_at, price, price_cents, currency, year, source, keywords, search_document,
+				closed_at,
+				'closed'
+			FROM closed_listings
+		""")
+
+		# Bid timeline, one row per observed price change, partitioned by month so old
+		# months can be detached or dropped without touching current ones
+		await conn.execute("""
+			CREATE TABLE IF NOT EXISTS bid_history (
+				url TEXT NOT NULL,
+				observed_at TIMESTAMP WITH TIME ZONE NOT NULL,
+				price_cents BIGINT NOT NULL,
+				currency TEXT,
+				PRIMARY KEY (url, observed_at)
+			) PARTITION BY RANGE (observed_at)
+		""")
+		await ensure_bid_partitions(conn, datetime.now(timezone.utc))
+
+		# Sold price stats per model and year, refreshed by the scheduler for the groups
+		# that had listings close, so /price_stats never aggregates closed_listings itself
+		await conn.execute(f"""
+			ALTER TABLE closed_listings ADD COLUMN IF NOT EXISTS model TEXT
+			GENERATED ALWAYS AS ({MODEL_EXPRESSION}) STORED
+		""")
+		await conn.execute("CREATE INDEX IF NOT EXISTS idx_closed_listings_model_year ON closed_listings (model, year, currency)")
+		await conn.execute("CREATE INDEX IF NOT EXISTS idx_closed_listings_closed_at ON closed_listings (closed_at)")
+		await conn.execute("""
+			CREATE TABLE IF NOT EXISTS price_stats (
+				model TEXT,
+				year INTEGER,
+				currency TEXT,
+				sales INTEGER NOT NULL,
+				median_cents BIGINT NOT NULL,
+				p10_cents BIGINT NOT NULL,
+				p90_cents BIGINT NOT NULL,
+				refreshed_at TIMESTAMP WITH TIME ZONE NOT NULL,
+				PRIMARY KEY (model, year, currency)
+			)
+		""")
+		# Backfill from listings closed before the stats existed, or whose prices were just reparsed
+		if closed_prices_backfilled or not await conn.fetchval("SELECT EXISTS (SELECT 1 FROM price_stats)"):
+			await refresh_price_stats(conn)
+
+@app.after_serving
+async def shutdown():
+	"""Close the browser and database pools"""
+	await browser_pool.stop()
+	await db.pool.close()
+
+@app.route("/stats", methods=["GET"])
+async def get_stats():
+	"""Get connection pool, browser pool, search cache, coalescing and keyword backlog metrics"""
+	try:
+		async with db.acquire() as conn:
+			keyword_backlog = await backlog_stats(conn)
+	except Exception as e:
+		keyword_backlog = {"error": str(e)}
+
+	return jsonify({
+		"db_pool": db.pool.stats(),
+		"browser_pool": browser_pool.stats(),
+		"search_cache": search_cache.stats(),
+		"search_flights": search_flights.stats(),
+		"keyword_backlog": keyword_backlog
+	}), 200
+
+async def sync_search_cache_refresh():
+	"""Expire each site's cached search results once the scheduler has refreshed that site"""
+	if not search_cache.refresh_check_due():
+		return
+	async with db.acquire() as conn:
+		rows = await conn.fetch("SELECT source, last_seen_at FROM scrape_status")
+	search_cache.mark_refreshed({row["source"]: row["last_seen_at"] for row in rows})
 
 @app.route("/search", methods=["GET"])
 async def get_search():
-	"""Search for listings using PostgreSQL full-text search"""
-	query = str(request.args.get("query")).lower()
+	"""Search for listings by scraping each site, serving cached results where possible"""
+	query = request.args.get("query", "")
 
 	try:
-		results = await run_search_scrapers(query)
-		return jsonify(results), 200
+		await sync_search_cache_refresh()
+		results = await run_search_scrapers(query, browser_pool, search_cache)
+		return jsonify({url: listing.to_dict() for url, listing in results.items()}), 200
 	
 	except Exception as e:
 		return jsonify({"error": str(e)}), 500
 
+def listing_row_to_dict(row) -> dict:
+	"""Convert a live_listings row selected with LISTING_COLUMNS to its JSON representation"""
+	listing = {
+		"title": row["title"],
+		"url": row["url"],
+		"image": row["image"],
+		"time": row["time"],
+		"price": row["price"],
+		"price_cents": row["price_cents"],
+		"currency": row["currency"],
+		"year": row["year"],
+		"source": row["source"],
+		"scraped_at": row["scraped_at"].isoformat() if row["scraped_at"] else None
+	}
+	if "keywords" in row:
+		listing["keywords"] = row["keywords"].split() if row["keywords"] else []
+	if "status" in row:
+		listing["status"] = row["status"]
+	return listing
+
+def listings_response(rows, listing_query: ListingQuery):
+	"""Paginated requests get an ordered page and a cursor, others the full result keyed by title"""
+	rows, next_cursor = listing_query.page(rows)
+	if listing_query.paginated:
+		return jsonify({
+			"listings": [listing_row_to_dict(row) for row in rows],
+			"next_cursor": next_cursor
+		}), 200
+	return jsonify({row["title"]: listing_row_to_dict(row) for row in rows}), 200
+
+LISTING_COLUMNS = """
+	title, url, image, time, price, price_cents, currency, year, source,
+	GREATEST(scraped_at, (SELECT last_seen_at FROM scrape_status s WHERE s.source = live_listings.source)) AS scraped_at
+"""
+
+# search_listings computes scraped_at per status, so it is selected as is
+SEARCH_COLUMNS = """
+	title, url, image, time, price, price_cents, currency, year, source, scraped_at, keywords, status
+"""
+
 @app.route("/db_search", methods=["GET"])
 async def get_db_search():
-	"""Search for listings using PostgreSQL full-text search"""
-	query = str(request.args.get("query")).lower()
+	"""Search for listings using PostgreSQL full-text search, with optional filters, sorting and pagination"""
+	tsquery, terms = search_tsquery(request.args)
+	if not terms:
+		return jsonify({"error": "No listings found"}), 404
 
 	try:
-		conn = await asyncpg.connect(**PG_CONN)
-		try:
-			rows = await conn.fetch("""
-				SELECT title, url, image, time, price, year, scraped_at, keywords
-				FROM live_listings
-				WHERE keywords @@ plainto_tsquery('english', $1)
-				ORDER BY time DESC
-			""", query)
-		finally:
-			await conn.close()
-		if not rows:
+		status = search_status(request.args)
+		listing_query = ListingQuery(request.args, sorts=search_sorts(tsquery))
+	except InvalidQueryError as e:
+		return jsonify({"error": str(e)}), 400
+
+	conditions = [f"search_document @@ {tsquery}"]
+	params = [terms]
+	if status != "all":
+		conditions.append("status = $2")
+		params.append(status)
+
+	try:
+		sql, params = listing_query.build(
+			SEARCH_COLUMNS, "search_listings", conditions, params
+		)
+		async with db.acquire() as conn:
+			rows = await conn.fetch(sql, *params)
+		if not rows and not listing_query.cursor:
 			return jsonify({"error": "No listings found"}), 404
-		
-		# Convert rows to a dictionary format
-		listings = {}
-		for row in rows:
-			title, url, image, time_rem, price, year, scraped_at, keywords = row
-			listings[title] = {
-				"title": title,
-				"url": url,
-				"image": image,
-				"time": time_rem,
-				"price": price,
-				"year": year,
-				"keywords": keywords.split() if keywords else [],
-				"scraped_at": scraped_at.isoformat() if scraped_at else None
-			}
 
-		return jsonify(listings), 200
+		return listings_response(rows, listing_query)
 	except Exception as e:
 		return jsonify({"error": str(e)}), 500
 	
 @app.route("/listings", methods=["GET"])
 async def get_all_listings():
-	"""Get all live listings from PostgreSQL using asyncpg"""
+	"""Get live listings from PostgreSQL, with optional filters, sorting and pagination"""
+	try:
+		listing_query = ListingQuery(request.args)
+	except InvalidQueryError as e:
+		return jsonify({"error": str(e)}), 400
+
 	refresh = request.args.get("refresh")
 	if refresh and refresh.lower() == "true":
 		try:
@@ -419,38 +633,41 @@ async def get_all_listings():
 			return jsonify({"error": str(e)}), 500
 
 	try:
-		conn = await asyncpg.connect(**PG_CONN)
-		try:
-			rows = await conn.fetch("""
-				SELECT title, url, image, time, price, year, scraped_at
-				FROM live_listings
-				ORDER BY time DESC
-			""")
-		finally:
-			await conn.close()
+		sql, params = listing_query.build(LISTING_COLUMNS, "live_listings")
+		async with db.acquire() as conn:
+			rows = await conn.fetch(sql, *params)
 
-		if not rows:
+		if not rows and not listing_query.cursor:
 			return jsonify({"error": "No listings found"}), 404
 
-		# Convert rows to a dictionary format
-		listings = {}
-		for row in rows:
-			title, url, image, time, price, year, scraped_at = row
-			listings[title] = {
-				"title": title,
-				"url": url,
-				"image": image,
-				"time": time,
-				"price": price,
-				"year": year,
-				"scraped_at": scraped_at.isoformat() if scraped_at else None
-			}
-
-		return jsonify(listings), 200
+		return listings_response(rows, listing_query)
 	
 	except Exception as e:
 		return jsonify({"error": str(e)}), 500
 
+@app.route("/price_stats", methods=["GET"])
+async def get_model_price_stats():
+	"""Get precomputed sold price stats for a model, per model year"""
+	model = request.args.get("model")
+	if not model:
+		return jsonify({"error": "model is required"}), 400
+
+	try:
+		year_min = int(request.args["year_min"]) if request.args.get("year_min") else None
+		year_max = int(request.args["year_max"]) if request.args.get("year_max") else None
+	except ValueError:
+		return jsonify({"error": "year_min and year_max must be integers"}), 400
+
+	try:
+		async with db.acquire() as conn:
+			stats = await get_price_stats(conn, model, year_min, year_max)
+		if not stats:
+			return jsonify({"error": "No sold listings found"}), 404
+
+		return jsonify({"model": normalize_model(model), "stats": stats}), 200
+	except Exception as e:
+		return jsonify({"error": str(e)}), 500
+
 @app.route("/save", methods=["POST"])
 @login_required
 async def save_listing():
@@ -467,12 +684,10 @@ async def save_listing():
 	saved_at = datetime.now(timezone.utc)
 
 	try:
-		conn = await asyncpg.connect(**PG_CONN)
-
-		try:
+		async with db.acquire() as conn:
 			# Fetch listing data from live_listings
 			listing = await conn.fetchrow("""
-				SELECT title, url, image, time, price, year, keywords
+				SELECT title, url, image, time, price, price_cents, currency, year, keywords
 				FROM live_listings WHERE url = $1
 			""", url)
 			if not listing:
@@ -480,14 +695,11 @@ async def save_listing():
 
 			# Insert into saved_listings
 			await conn.execute("""
-				INSERT INTO saved_listings (user_id, url, title, image, time, price, year, saved_at)
-				VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+				INSERT INTO saved_listings (user_id, url, title, image, time, price, price_cents, currency, year, saved_at)
+				VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
 				ON CONFLICT (user_id, url) DO NOTHING
 			""", user_id, listing['url'], listing['title'], listing['image'], listing['time'],
-				listing['price'], listing['year'], saved_at)
-		
-		finally:
-			await conn.close()
+				listing['price'], listing['price_cents'], listing['currency'], listing['year'], saved_at)
 
 		return jsonify({
 			'message': 'Login successful',
@@ -506,15 +718,12 @@ async def get_garage():
 		return jsonify({'error': 'User not found'}), 401
 	
 	try:
-		conn = await asyncpg.connect(**PG_CONN)
-		try:
+		async with db.acquire() as conn:
 			rows = await conn.fetch("""
 				SELECT title, url, image, time, price, year
 				FROM saved_listings WHERE user_id = $1
 				ORDER BY saved_at DESC
 			""", user_id)
-		finally:
-			await conn.close()
 
 		if not rows:
 			return {}, 200
@@ -551,17 +760,13 @@ async def delete_saved_listing():
 		return jsonify({'error': 'User not found'}), 401
 	
 	try:
-		conn = await asyncpg.connect(**PG_CONN)
-		try:
+		async with db.acquire() as conn:
 			result = await conn.execute("""
 				DELETE FROM saved_listings WHERE user_id = $1 AND url = $2
 			""", user_id, url)
 			
 			if result == "DELETE 0":
 				return jsonify({"error": "Listing not found in garage"}), 404
-			
-		finally:
-			await conn.close()
 
 		return jsonify({"message": "Listing deleted successfully"}), 200
 	
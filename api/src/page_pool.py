@@ -0,0 +1,139 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from playwright.async_api import BrowserContext, Page
+from typing import Dict, List, Set
+
+BLANK_URL = "about:blank"
+HEALTH_CHECK_TIMEOUT = 2
+
+
+class PagePool:
+	"""
+	Bounded pool of reusable pages on a single browser context.
+
+	Pages are health-checked when acquired and reset to about:blank when
+	released. Pages that were closed by the caller, crashed or fail the
+	health check are dropped and replaced with a fresh page, so a site module
+	closing its page never hands a dead page to the next task.
+	"""
+
+	def __init__(self, context: BrowserContext, max_pages: int, max_uses: int = 20):
+		self.context = context
+		self.max_pages = max_pages
+		self.max_uses = max_uses
+		self._slots = asyncio.Semaphore(max_pages)
+		self._idle: List[Page] = []
+		self._uses: Dict[Page, int] = {}
+		self._crashed: Set[Page] = set()
+		self._closed = False
+
+		# Metrics
+		self.created = 0
+		self.reused = 0
+		self.recycled = 0
+		self.discarded = 0
+		self.in_use = 0
+
+	async def warm(self, count: int) -> None:
+		"""Open pages ahead of time so the first requests skip page creation."""
+		for _ in range(min(count, self.max_pages) - len(self._idle)):
+			self._idle.append(await self._new_page())
+
+	async def __aenter__(self) -> "PagePool":
+		return self
+
+	async def __aexit__(self, *exc) -> None:
+		await self.close()
+
+	async def _new_page(self) -> Page:
+		page = await self.context.new_page()
+		page.on("crash", self._crashed.add)
+		self._uses[page] = 0
+		self.created += 1
+		return page
+
+	async def _is_healthy(self, page: Page) -> bool:
+		"""Check that a page is open, has not crashed and still runs script."""
+		if page.is_closed() or page in self._crashed:
+			return False
+		try:
+			await asyncio.wait_for(page.evaluate("1"), HEALTH_CHECK_TIMEOUT)
+			return True
+		except Exception:
+			return False
+
+	async def _take_page(self) -> Page:
+		"""Return an idle page if one is still usable, otherwise open a new one."""
+		while self._idle:
+			page = self._idle.pop()
+			if await self._is_healthy(page):
+				self.reused += 1
+				return page
+			await self._discard(page)
+		return await self._new_page()
+
+	async def _discard(self, page: Page) -> None:
+		"""Drop a dead page from the pool, closing it if it is still open."""
+		self._uses.pop(page, None)
+		self._crashed.discard(page)
+		self.discarded += 1
+		if not page.is_closed():
+			try:
+				await page.close()
+			except Exception:
+				pass
+
+	async def _give_back(self, page: Page) -> None:
+		"""Reset a page for reuse, or close it once it has served max_uses requests."""
+		if page.is_closed() or page in self._crashed:
+			await self._discard(page)
+			return
+
+		self._uses[page] = self._uses.get(page, 0) + 1
+		if self._closed or self._uses[page] >= self.max_uses:
+			self._uses.pop(page, None)
+			self.recycled += 1
+			await page.close()
+			return
+
+		try:
+			await page.goto(BLANK_URL)
+		except Exception as e:
+			logging.warning(f"Discarding page that failed to reset: {e}")
+			await self._discard(page)
+			return
+		self._idle.append(page)
+
+	@asynccontextmanager
+	async def page(self):
+		"""Acquire a page for the duration of the block."""
+		async with self._slots:
+			page = await self._take_page()
+			self.in_use += 1
+			try:
+				yield page
+			finally:
+				self.in_use -= 1
+				await self._give_back(page)
+
+	async def close(self) -> None:
+		"""Close all idle pages. Pages still in use are closed when released."""
+		self._closed = True
+		idle, self._idle = self._idle, []
+		for page in idle:
+			self._uses.pop(page, None)
+			self._crashed.discard(page)
+			if not page.is_closed():
+				await page.close()
+
+	def stats(self) -> Dict:
+		return {
+			"max_pages": self.max_pages,
+			"in_use": self.in_use,
+			"idle": len(self._idle),
+			"created": self.created,
+			"reused": self.reused,
+			"recycled": self.recycled,
+			"discarded": self.discarded
+		}
@@ -1,12 +1,16 @@
 from playwright.async_api import async_playwright, Page, BrowserContext
+from selectolax.parser import HTMLParser
 from datetime import datetime, timezone
 from typing import Dict, Optional, List
 import re
+import os
 import listing
+from page_pool import PagePool
 import asyncio
 
 TIMEOUT = 15000
 BASE_URL = "https://www.pcarmarket.com"
+PAGE_CONCURRENCY = int(os.environ.get("PCAR_PAGE_CONCURRENCY", 4))
 
 class PCarMarketScraper:
 	"""Scraper for PCAR Market auction listings."""
@@ -19,11 +23,12 @@ class PCarMarketScraper:
 	
 	@staticmethod
 	def _format_auction_listing(data: Dict) -> tuple:
-		"""Format auction listing data."""
+		"""Format auction listing data, parsing the bid into cents and currency."""
 		bid = data['bid']
+		price_cents, currency = listing.parse_price(bid)
 		end_time = datetime.fromtimestamp(int(data['timeRemaining']), timezone.utc)
 		title = data['title']
-		return bid, end_time, title
+		return bid, price_cents, currency, end_time, title
 	
 	@staticmethod
 	async def _extract_search_listings(page: Page) -> List[Dict]:
@@ -65,6 +70,45 @@ class PCarMarketScraper:
 			}
 		""")
 	
+	@staticmethod
+	async def _extract_last_page(page: Page) -> int:
+		"""Return the highest page number linked from the pagination controls."""
+		return await page.evaluate("""
+			() => {
+				const pages = Array.from(document.querySelectorAll('a[href*="page="]'))
+					.map(a => parseInt(new URL(a.href, location.href).searchParams.get('page'), 10))
+					.filter(n => !isNaN(n));
+				return pages.length ? Math.max(...pages) : 1;
+			}
+		""")
+	
+	@staticmethod
+	def _parse_listing_keywords(html: str) -> Optional[Dict]:
+		"""Parse listing facts from server-rendered HTML, mirroring get_listing_details."""
+		tree = HTMLParser(html)
+		if tree.css_first('#auction-details-list') is None:
+			return None
+
+		facts = {}
+		for li in tree.css('#auction-details-list li'):
+			strong = li.css_first('strong')
+			if strong is not None:
+				key = strong.text().replace(':', '').strip()
+				value = li.text().replace(strong.text(), '').replace(':', '').strip()
+				facts[key] = value
+		return {
+			"model": facts.get('Model') or None
+		}
+	
+	@staticmethod
+	def _build_keywords(title: str, listing_keywords: Dict) -> str:
+		"""Combine extracted facts with the listing title."""
+		kw = [ 
+			listing_keywords.get("model", ""),
+			title.replace(".", " ")
+		]
+		return " ".join(filter(None, kw))
+	
 	@staticmethod
 	def _process_listing_data(data: Dict) -> Optional[listing.Listing]:
 		"""Process raw listing data into Listing format."""
@@ -73,7 +117,7 @@ class PCarMarketScraper:
 		
 		year = PCarMarketScraper._extract_year(data['title'])
 		
-		bid, end_time, title = PCarMarketScraper._format_auction_listing(data)
+		bid, price_cents, currency, end_time, title = PCarMarketScraper._format_auction_listing(data)
 		
 		url = f"{BASE_URL}{data['url']}"
 		key = f"PCAR: {title}"
@@ -84,18 +128,21 @@ class PCarMarketScraper:
 			data['image'], 
 			end_time, 
 			bid, 
-			year
+			year,
+			source="pcar",
+			price_cents=price_cents,
+			currency=currency
 		)
 
 
 
-async def get_results(query: str, browser, debug: bool = False) -> Dict:
+async def get_results(query: str, page: Page, debug: bool = False) -> Dict:
 	"""
 	Fetches search results from PCAR Market for a given query.
 
 	Args:
 		query: The desired car to search, formatted as a URL-encoded string
-		browser: Playwright async browser
+		page: Playwright async page, owned and closed by the caller
 		debug: Print debug information
 	
 	Returns:
@@ -106,7 +153,6 @@ async def get_results(query: str, browser, debug: bool = False) -> Dict:
 	if debug:
 		print(f"Searching: {search_url}")
 
-	page = await browser.new_page()
 	try:
 		await page.goto(search_url, timeout=TIMEOUT)
 
@@ -135,7 +181,7 @@ async def get_results(query: str, browser, debug: bool = False) -> Dict:
 		for data in listings_data:
 			processed = PCarMarketScraper._process_listing_data(data)
 			if processed:
-				results[processed.url] = processed.to_dict()
+				results[processed.url] = processed
 				
 				if debug:
 					print(processed)
@@ -146,78 +192,77 @@ async def get_results(query: str, browser, debug: bool = False) -> Dict:
 	except Exception as e:
 		print(f"Error scraping PCAR auctions: {e}")
 		return {}
-	finally:
-		await page.close()
 
 
-async def get_all_live(context: BrowserContext, debug: bool = False) -> Dict:
+async def _scrape_live_page(pages: PagePool, page_num: int) -> tuple:
+	"""Load one page of live auctions and return its listings and pagination info."""
+	async with pages.page() as page:
+		await page.goto(f"{BASE_URL}/auction/all/?page={page_num}", timeout=TIMEOUT)
+		await page.wait_for_selector('.post.car', timeout=TIMEOUT)
+		listings_data = await PCarMarketScraper._extract_live_listings(page)
+		last_page = await PCarMarketScraper._extract_last_page(page)
+		return listings_data, max(last_page, page_num)
+
+
+async def get_all_live(context: BrowserContext, debug: bool = False, concurrency: int = PAGE_CONCURRENCY) -> Dict:
 	"""
 	Fetches all live auctions from PCAR Market.
 
+	The page count is read from the first page's pagination links, and the
+	remaining pages are loaded concurrently on separate pages of the context.
+
 	Args:
 		context: Playwright async browser context
 		debug: Print debug information
+		concurrency: Maximum number of result pages loaded at once
 	
 	Returns:
 		Dictionary of all live listings
 	"""
-	search_url = f"{BASE_URL}/auction/all/?page=1"
-	page = await context.new_page()
-	
 	try:
-		await page.goto(search_url, timeout=TIMEOUT)
-		await page.wait_for_function(
-			"() => document.querySelector('.post.car') !== null",
-			timeout=TIMEOUT
-		)
-
-		results = {}
-		page_num = 1
-		
-		while True:
-			if debug:
-					print(f"Scraping page {page_num}")
+		async with PagePool(context, concurrency) as pages:
+			listings_data, last_page = await _scrape_live_page(pages, 1)
+			results_by_page = {1: listings_data}
+
+			# Pagination may only link a window of pages, so keep going until no page
+			# reports a later one than we have already fetched
+			fetched = 1
+			while last_page > fetched:
+				page_nums = range(fetched + 1, last_page + 1)
+				if debug:
+					print(f"Scraping pages {page_nums.start}-{page_nums.stop - 1}")
 
-			await page.wait_for_selector('.post.car', timeout=TIMEOUT)
-			listings_data = await PCarMarketScraper._extract_live_listings(page)
+				page_results = await asyncio.gather(*(
+					_scrape_live_page(pages, page_num) for page_num in page_nums
+				))
+				fetched = last_page
+				for page_num, (listings_data, page_last) in zip(page_nums, page_results):
+					results_by_page[page_num] = listings_data
+					last_page = max(last_page, page_last)
 
+		results = {}
+		for page_num in sorted(results_by_page):
 			if debug:
-					print(f"Found {len(listings_data)} auction listings on page {page_num}")
+				print(f"Found {len(results_by_page[page_num])} auction listings on page {page_num}")
 
-			for data in listings_data:
+			for data in results_by_page[page_num]:
 				processed = PCarMarketScraper._process_listing_data(data)
 				if processed:
-					results[processed.url] = processed.to_dict()
+					results[processed.url] = processed
 					
 					if debug:
 						print(processed)
 						print("-" * 50)
 
-			# Check for next page
-			has_next = await page.evaluate("""
-				() => {
-					const nextLi = document.querySelector('li.next:not(.disabled)');
-					return !!(nextLi && nextLi.querySelector('a'));
-				}
-			""")
-			
-			if has_next:
-				await page.click('li.next:not(.disabled) a')
-				await page.wait_for_load_state('domcontentloaded', timeout=TIMEOUT)
-				page_num += 1
-			else:
-				break
-
 		if debug:
 			print(f"Total listings found: {len(results)}")
 
 		return results
 
 	except Exception as e:
+		# A missing page would make its listings look closed, so fail the whole scrape
 		print(f"Error scraping PCAR auctions: {e}")
 		return {}
-	finally:
-		await page.close()
 
 
 async def get_listing_details(title: str, url: str, page, debug: bool = False) -> None:
@@ -227,7 +272,7 @@ async def get_listing_details(title: str, url: str, page, debug: bool = False) -
 	Args:
 		title: The title of the listing
 		url: The URL of the listing
-		page: Playwright async page
+		page: Playwright async page, owned and closed by the caller
 		debug: Print debug information
 	Returns:
 		Keywords extracted from the listing
@@ -254,20 +299,36 @@ async def get_listing_details(title: str, url: str, page, debug: bool = False) -
 		""")
 
 		# Update listing with keywords
-		kw = [ 
-			listing_keywords.get("model", ""),
-			title.replace(".", " ")
-		]
+		kw = PCarMarketScraper._build_keywords(title, listing_keywords)
 		
 		if debug:
 			print(f"Keywords for {title}: {kw}")
 
-		return " ".join(filter(None, kw))
+		return kw
 
 	except Exception as e:
 		print(f'Error fetching PCAR details for {title}: {e}')
-	finally:
-		await page.close()
+
+
+def parse_listing_details(title: str, html: str, debug: bool = False) -> Optional[str]:
+	"""
+	Extracts keywords for a listing from its fetched HTML, without a browser.
+
+	Args:
+		title: The title of the listing
+		html: The listing page's server-rendered HTML
+		debug: Print debug information
+	Returns:
+		Keywords extracted from the listing, or None if the page needs JavaScript
+	"""
+	listing_keywords = PCarMarketScraper._parse_listing_keywords(html)
+	if listing_keywords is None:
+		return None
+
+	kw = PCarMarketScraper._build_keywords(title, listing_keywords)
+	if debug:
+		print(f"Keywords for {title}: {kw}")
+	return kw
 
 # Test functions
 async def _test_results():
@@ -277,7 +338,8 @@ async def _test_results():
 		try:
 			from urllib.parse import quote
 			query = quote("Porsche 911 991")
-			await get_results(query, browser, debug=True)
+			page = await browser.new_page()
+			await get_results(query, page, debug=True)
 		finally:
 			await browser.close()
 
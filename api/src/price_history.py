@@ -0,0 +1,114 @@
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+# Make and model of a listing, the two words after the first model year in its title,
+# e.g. "BaT: 21k-Mile 2005 Porsche 911 Carrera" -> "porsche 911". Used as the generated
+# model column of closed_listings, so it must stay an immutable expression.
+MODEL_EXPRESSION = """
+	regexp_replace(
+		substring(lower(title) FROM '\\m(?:19|20)[0-9]{2}\\s+(\\S+(?:\\s+\\S+)?)'),
+		'\\s+', ' ', 'g'
+	)
+"""
+
+# bid_history partitions known to exist, so each cycle does not look them up again
+_partitions: Set[str] = set()
+
+
+def normalize_model(model: Optional[str]) -> str:
+	"""Lowercase a model name and collapse its whitespace, to match MODEL_EXPRESSION."""
+	return " ".join((model or "").lower().split())
+
+
+def _month_start(year: int, month: int) -> datetime:
+	# Roll over into the next year for month 13
+	return datetime(year + (month - 1) // 12, (month - 1) % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+async def ensure_bid_partitions(conn, now: datetime) -> None:
+	"""Create the bid_history partitions for the month of now and the month after it."""
+	now = now.astimezone(timezone.utc)
+	for offset in (0, 1):
+		start = _month_start(now.year, now.month + offset)
+		end = _month_start(start.year, start.month + 1)
+		name = f"bid_history_{start:%Y_%m}"
+		if name in _partitions:
+			continue
+		if await conn.fetchval("SELECT to_regclass($1)", name) is None:
+			await conn.execute(f"""
+				CREATE TABLE IF NOT EXISTS {name} PARTITION OF bid_history
+				FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')
+			""")
+			logging.info(f"Created bid history partition {name}")
+		_partitions.add(name)
+
+
+async def record_bid_changes(conn, staging: str, observed_at: datetime) -> int:
+	"""
+	Append a bid_history row for every staged listing whose price is new or changed.
+
+	Must run after the staging table is loaded and before live_listings is updated from it,
+	so unchanged prices are not recorded again. Returns the number of rows appended.
+	"""
+	await ensure_bid_partitions(conn, observed_at)
+	status = await conn.execute(f"""
+		INSERT INTO bid_history (url, observed_at, price_cents, currency)
+		SELECT t.url, $1, t.price_cents, t.currency
+		FROM {staging} t
+		LEFT JOIN live_listings l ON l.url = t.url
+		WHERE t.price_cents IS NOT NULL
+		AND l.price_cents IS DISTINCT FROM t.price_cents
+	""", observed_at)
+	return int(status.split()[-1])
+
+
+async def refresh_price_stats(conn, closed_at: Optional[datetime] = None) -> int:
+	"""
+	Recompute sold price stats for every (model, year, currency) group with a listing closed at closed_at.
+
+	Percentiles cannot be updated in place, so each affected group is recomputed from
+	its closed listings, which the model index keeps to a small range scan. Without
+	closed_at every group is rebuilt. Returns the number of groups refreshed.
+	"""
+	condition = "closed_at = $1" if closed_at is not None else "TRUE"
+	params = [closed_at] if closed_at is not None else []
+	status = await conn.execute(f"""
+		WITH groups AS (
+			SELECT DISTINCT model, year, currency
+			FROM closed_listings
+			WHERE {condition}
+			AND model IS NOT NULL AND year IS NOT NULL AND currency IS NOT NULL
+			AND price_cents IS NOT NULL
+		)
+		INSERT INTO price_stats (model, year, currency, sales, median_cents, p10_cents, p90_cents, refreshed_at)
+		SELECT c.model, c.year, c.currency, COUNT(*),
+			round(percentile_cont(0.5) WITHIN GROUP (ORDER BY c.price_cents)),
+			round(percentile_cont(0.1) WITHIN GROUP (ORDER BY c.price_cents)),
+			round(percentile_cont(0.9) WITHIN GROUP (ORDER BY c.price_cents)),
+			NOW()
+		FROM closed_listings c
+		JOIN groups g ON g.model = c.model AND g.year = c.year AND g.currency = c.currency
+		WHERE c.price_cents IS NOT NULL
+		GROUP BY c.model, c.year, c.currency
+		ON CONFLICT (model, year, currency) DO UPDATE
+		SET sales = EXCLUDED.sales, median_cents = EXCLUDED.median_cents, p10_cents = EXCLUDED.p10_cents,
+			p90_cents = EXCLUDED.p90_cents, refreshed_at = EXCLUDED.refreshed_at
+	""", *params)
+	return int(status.split()[-1])
+
+
+async def get_price_stats(conn, model: str, year_min: Optional[int] = None, year_max: Optional[int] = None) -> List[Dict]:
+	"""Read the precomputed stats for a model, oldest model year first."""
+	rows = await conn.fetch("""
+		SELECT year, currency, sales, median_cents, p10_cents, p90_cents, refreshed_at
+		FROM price_stats
+		WHERE model = $1
+		AND ($2::integer IS NULL OR year >= $2)
+		AND ($3::integer IS NULL OR year <= $3)
+		ORDER BY year, currency
+	""", normalize_model(model), year_min, year_max)
+	return [
+		{**dict(row), "refreshed_at": row["refreshed_at"].isoformat()}
+		for row in rows
+	]
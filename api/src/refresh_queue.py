@@ -0,0 +1,168 @@
+import heapq
+import itertools
+import logging
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Refresh cadence config
+SWEEP_INTERVAL_MINUTES = int(os.environ.get("SWEEP_INTERVAL_MINUTES", 15))
+FINAL_WINDOW_MINUTES = int(os.environ.get("FINAL_WINDOW_MINUTES", 5))
+FINAL_REFRESH_SECONDS = int(os.environ.get("FINAL_REFRESH_SECONDS", 120))
+KEYWORD_INTERVAL_MINUTES = int(os.environ.get("KEYWORD_INTERVAL_MINUTES", 2))
+# Live page loads allowed per site in any rolling hour, sweeps and final refreshes combined.
+# The default matches the old fixed two-minute cycle, so volume never exceeds it, and drops
+# to one sweep per SWEEP_INTERVAL_MINUTES while a site has no auctions ending.
+SITE_MAX_SCRAPES_PER_HOUR = int(os.environ.get("SITE_MAX_SCRAPES_PER_HOUR", 30))
+
+# Task kinds
+SWEEP = "sweep"
+FINAL = "final"
+KEYWORDS = "keywords"
+
+# Tasks due at the same time run in this order
+PRIORITIES = {SWEEP: 0, FINAL: 1, KEYWORDS: 2}
+
+
+@dataclass(order=True)
+class RefreshTask:
+	"""A scheduled refresh, ordered by due time (epoch seconds) and then kind."""
+	due: float
+	priority: int
+	seq: int
+	kind: str = field(compare=False)
+	site: Optional[str] = field(compare=False, default=None)
+
+	@property
+	def key(self) -> Tuple[str, Optional[str]]:
+		return self.kind, self.site
+
+
+class RateBudget:
+	"""Rolling one-hour budget of live page loads per site."""
+
+	def __init__(self, sites: List[str], max_per_hour: int = SITE_MAX_SCRAPES_PER_HOUR):
+		self.max_per_hour = max_per_hour
+		self._spent: Dict[str, Deque[float]] = {site: deque() for site in sites}
+
+	def _trim(self, site: str, now: float) -> Deque[float]:
+		spent = self._spent[site]
+		while spent and spent[0] <= now - 3600:
+			spent.popleft()
+		return spent
+
+	def available_at(self, site: str, now: float) -> float:
+		"""Earliest time the site can be scraped again."""
+		spent = self._trim(site, now)
+		if len(spent) < self.max_per_hour:
+			return now
+		return spent[len(spent) - self.max_per_hour] + 3600
+
+	def spend(self, site: str, now: float) -> None:
+		self._trim(site, now).append(now)
+
+	def stats(self, now: float) -> Dict[str, int]:
+		return {site: len(self._trim(site, now)) for site in self._spent}
+
+
+class RefreshQueue:
+	"""
+	Priority queue of scheduler work: a full sweep of each site, frequent refreshes of a
+	site while it has auctions in their final minutes, and keyword extraction batches.
+
+	There is at most one pending task per kind and site. Rescheduling keeps the earlier
+	of the two due times, and no task runs sooner than its kind's interval after it last
+	started. Tasks that scrape a site whose budget is spent are pushed back until it refills.
+	A final refresh loads and merges the whole site, so it also counts as the site's sweep.
+	"""
+
+	def __init__(self, sites: List[str], sweep_interval: float = SWEEP_INTERVAL_MINUTES * 60,
+			final_interval: float = FINAL_REFRESH_SECONDS, keyword_interval: float = KEYWORD_INTERVAL_MINUTES * 60,
+			max_per_hour: int = SITE_MAX_SCRAPES_PER_HOUR):
+		self.sites = sites
+		self.intervals = {SWEEP: sweep_interval, FINAL: final_interval, KEYWORDS: keyword_interval}
+		self.budget = RateBudget(sites, max_per_hour)
+		if 3600 / final_interval > max_per_hour:
+			logging.warning(f"Final refreshes every {final_interval:g}s need {3600 / final_interval:.0f} scrapes an hour, "
+				f"more than the budget of {max_per_hour}, so sites with auctions ending for long will be refreshed less often")
+		self._heap: List[RefreshTask] = []
+		self._pending: Dict[Tuple[str, Optional[str]], RefreshTask] = {}
+		self._last_started: Dict[Tuple[str, Optional[str]], float] = {}
+		self._seq = itertools.count()
+
+		# Metrics
+		self.started = {kind: 0 for kind in PRIORITIES}
+		self.deferred = 0
+
+	def schedule(self, kind: str, due: float, site: Optional[str] = None) -> RefreshTask:
+		"""Schedule a task no earlier than due, or keep the pending one if it is already sooner."""
+		key = (kind, site)
+		last = self._last_started.get(key)
+		if last is not None:
+			due = max(due, last + self.intervals[kind])
+
+		pending = self._pending.get(key)
+		if pending is not None and pending.due <= due:
+			return pending
+		# A superseded task stays in the heap and is skipped when popped
+		task = RefreshTask(due, PRIORITIES[kind], next(self._seq), kind, site)
+		self._pending[key] = task
+		heapq.heappush(self._heap, task)
+		return task
+
+	def sites_of(self, task: RefreshTask) -> List[str]:
+		"""Sites whose live pages the task loads."""
+		if task.kind in (SWEEP, FINAL):
+			return [task.site] if task.site else self.sites
+		return []
+
+	def _discard_superseded(self) -> None:
+		while self._heap and self._pending.get(self._heap[0].key) is not self._heap[0]:
+			heapq.heappop(self._heap)
+
+	def next_due(self) -> Optional[float]:
+		"""Due time of the next task, or None if nothing is scheduled."""
+		self._discard_superseded()
+		return self._heap[0].due if self._heap else None
+
+	def pop_due(self, now: float) -> Optional[RefreshTask]:
+		"""Remove and return the next task due by now that is within its sites' budgets."""
+		while True:
+			self._discard_superseded()
+			if not self._heap or self._heap[0].due > now:
+				return None
+			task = heapq.heappop(self._heap)
+			ready = max((self.budget.available_at(site, now) for site in self.sites_of(task)), default=now)
+			if ready > now:
+				self.deferred += 1
+				deferred = RefreshTask(ready, task.priority, next(self._seq), task.kind, task.site)
+				self._pending[task.key] = deferred
+				heapq.heappush(self._heap, deferred)
+				continue
+			del self._pending[task.key]
+			return task
+
+	def ran_recently(self, task: RefreshTask, now: float) -> bool:
+		"""Whether a task of the same kind and site started less than an interval ago, e.g. a sweep after a final refresh."""
+		last = self._last_started.get(task.key)
+		return last is not None and now < last + self.intervals[task.kind]
+
+	def start(self, task: RefreshTask, now: float) -> None:
+		"""Record that a popped task is starting, spending its sites' budgets."""
+		self._last_started[task.key] = now
+		if task.kind == FINAL:
+			# The site was just swept in full, so its next sweep is an interval away
+			self._last_started[(SWEEP, task.site)] = now
+			self._pending.pop((SWEEP, task.site), None)
+		self.started[task.kind] += 1
+		for site in self.sites_of(task):
+			self.budget.spend(site, now)
+
+	def stats(self, now: float) -> Dict:
+		return {
+			"pending": len(self._pending),
+			"started": dict(self.started),
+			"deferred": self.deferred,
+			"scrapes_last_hour": self.budget.stats(now)
+		}
@@ -1,47 +1,61 @@
 import asyncio
-from playwright.async_api import async_playwright
+from typing import Dict, Optional
+from browser_pool import BrowserPool
+from search_cache import SearchCache, normalize_query
+from single_flight import SingleFlight
 import cars_and_bids, pcarmarket, bring_a_trailer
 
-async def run_search_scrapers(query):
+SEARCH_SCRAPERS = {
+	'bat': bring_a_trailer,
+	'pcar': pcarmarket,
+	'cab': cars_and_bids
+}
+
+# Concurrent searches for the same site and query share one scrape
+search_flights = SingleFlight()
+
+async def _search_site(pool: BrowserPool, site: str, query: str, cache: Optional[SearchCache]) -> Dict:
+	"""Return one site's results from the cache, or scrape them on a pooled page"""
+	# The normalized key is only used to share results, the site is searched for the query as given
+	key = normalize_query(query)
+	if cache is not None:
+		cached = cache.get(site, key)
+		if cached is not None:
+			return cached
+
+	async def scrape() -> Dict:
+		async with pool.page(site) as page:
+			results = await SEARCH_SCRAPERS[site].get_results(query, page)
+
+		# Scrapers return {} on failure as well as on no matches, so only cache hits
+		if cache is not None and results:
+			cache.set(site, key, results)
+		return results
+
+	return await search_flights.do((site, key), scrape)
+
+async def run_search_scrapers(query, pool: Optional[BrowserPool] = None, cache: Optional[SearchCache] = None):
 	"""Run all scrapers asynchronously and return combined results"""
-	async with async_playwright() as p:
-		browser = await p.chromium.launch(
-			headless=True,
-			args=[
-				'--no-sandbox',
-				'--disable-setuid-sandbox',
-				'--disable-dev-shm-usage',
-				'--disable-accelerated-2d-canvas',
-				'--no-first-run',
-				'--no-zygote',
-				'--disable-gpu',
-				'--disable-web-security',
-				'--disable-features=VizDisplayCompositor'
-			]
-		)
-		
-		context = await browser.new_context(
-			user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-			viewport={'width': 1920, 'height': 1080},
-			locale='en-US',
-			timezone_id='America/New_York'
-		)
-		
-		try:
-			results = await asyncio.gather(
-				bring_a_trailer.get_results(query, context),
-				pcarmarket.get_results(query, context),
-				cars_and_bids.get_results(query, context)
-			)
-		finally:
-			await browser.close()
-		
-		# Combine results
-		combined = {}
-		for result_dict in results:
-			combined.update(result_dict)
-		
-		return combined
+	# Fall back to a one-off browser when called outside the API process
+	owns_pool = pool is None
+	if owns_pool:
+		pool = BrowserPool()
+		await pool.start()
+
+	try:
+		results = await asyncio.gather(*(
+			_search_site(pool, site, query, cache) for site in SEARCH_SCRAPERS
+		))
+	finally:
+		if owns_pool:
+			await pool.stop()
+
+	# Combine results
+	combined = {}
+	for result_dict in results:
+		combined.update(result_dict)
+
+	return combined
 
 if __name__ == "__main__":
 	async def test():
@@ -1,13 +1,18 @@
-import schedule
 import asyncio
-import asyncpg
 import time
 import logging
 import os
+import signal
+import db
 from dotenv import load_dotenv
 from datetime import datetime, timezone
 from playwright.async_api import async_playwright, BrowserContext
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
+from keyword_enricher import KeywordEnricher, backlog_stats
+from price_history import record_bid_changes, refresh_price_stats
+from listing import Listing
+from listing_query import SOURCES
+from refresh_queue import RefreshQueue, RefreshTask, SWEEP, FINAL, KEYWORDS, FINAL_WINDOW_MINUTES
 import bring_a_trailer, pcarmarket, cars_and_bids
 
 # Configure logging
@@ -22,19 +27,17 @@ logging.getLogger("asyncio").setLevel(logging.ERROR)
 # Load environment variables
 load_dotenv()
 
-# Database config
-PG_CONN = {
-	"host": os.environ.get("PG_HOST"),
-	"database": os.environ.get("PG_DATABASE"),
-	"user": os.environ.get("PG_USER"),
-	"password": os.environ.get("PG_PASSWORD")
-}
-
 # Constants
 MIN_BAT_LISTINGS = 500
-KEYWORD_BATCH_SIZE = int(os.environ.get("KEYWORD_BATCH_SIZE", 50))
-SCHEDULE_INTERVAL_MINUTES = int(os.environ.get("SCHEDULE_INTERVAL_MINUTES", 2))
-ASYNC_KEYWORD_SCRAPE_COUNT = int(os.environ.get("ASYNC_KEYWORD_SCRAPE_COUNT", 2))
+# Run keyword extraction alongside the live scrape instead of after it
+KEYWORDS_DURING_SCRAPE = os.environ.get("KEYWORDS_DURING_SCRAPE", "false").lower() == "true"
+# End times derived from "time remaining" text drift by a few seconds between scrapes
+END_TIME_TOLERANCE_SECONDS = int(os.environ.get("END_TIME_TOLERANCE_SECONDS", 10))
+# How long running tasks get to finish after SIGTERM before they are cancelled
+SCHEDULER_SHUTDOWN_SECONDS = int(os.environ.get("SCHEDULER_SHUTDOWN_SECONDS", 60))
+
+# Column order of temp_listings rows loaded by COPY, as produced by Listing.to_record
+STAGING_COLUMNS = ["url", "title", "image", "time", "price", "price_cents", "currency", "year", "source", "scraped_at"]
 
 
 class ScraperScheduler:
@@ -47,89 +50,126 @@ class ScraperScheduler:
 			'cab': cars_and_bids
 		}
 	
-	async def create_browser_contexts(self, browser) -> Tuple[BrowserContext, BrowserContext, BrowserContext]:
-		"""Create browser contexts for each scraper with appropriate settings and clear cache/cookies."""
-		# Cars & Bids context with full user agent
-		context_cab = await browser.new_context(
-			user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-			viewport={'width': 800, 'height': 600},
-			locale='en-US',
-			timezone_id='America/New_York'
-		)
-		# Standard contexts for other scrapers
-		context_bat = await browser.new_context(viewport={"width": 800, "height": 600})
-		context_pcar = await browser.new_context(viewport={"width": 800, "height": 600})
+	async def create_browser_context(self, browser, site: str) -> BrowserContext:
+		"""Create a browser context for one scraper with appropriate settings and clear cache/cookies."""
+		if site == 'cab':
+			# Cars & Bids context with full user agent
+			ctx = await browser.new_context(
+				user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+				viewport={'width': 800, 'height': 600},
+				locale='en-US',
+				timezone_id='America/New_York'
+			)
+		else:
+			# Standard contexts for other scrapers
+			ctx = await browser.new_context(viewport={"width": 800, "height": 600})
 
 		# Clear cookies and permissions to avoid cache/cookie reuse
-		for ctx in [context_bat, context_pcar, context_cab]:
-			await ctx.clear_cookies()
-			await ctx.clear_permissions()
+		await ctx.clear_cookies()
+		await ctx.clear_permissions()
 
 		# Block resources to speed up scraping
-		contexts = [context_bat, context_pcar, context_cab]
-		for ctx in contexts:
-			await ctx.route(
-				"**/*", 
-				lambda route, request: route.abort() 
-				if request.resource_type in ["image", "media", "font"] 
-				else route.continue_()
-			)
-			
+		await ctx.route(
+			"**/*", 
+			lambda route, request: route.abort() 
+			if request.resource_type in ["image", "media", "font"] 
+			else route.continue_()
+		)
+		return ctx
+	
+	async def create_browser_contexts(self, browser) -> Tuple[BrowserContext, BrowserContext, BrowserContext]:
+		"""Create browser contexts for each scraper."""
+		context_bat = await self.create_browser_context(browser, 'bat')
+		context_pcar = await self.create_browser_context(browser, 'pcar')
+		context_cab = await self.create_browser_context(browser, 'cab')
 		return context_bat, context_pcar, context_cab
 	
-	async def run_all_scrapers(self) -> Dict:
-		"""Run all scrapers concurrently and return combined results."""
+	async def launch_browser(self, p):
+		"""Launch headless Chromium with the scheduler's flags."""
+		return await p.chromium.launch(
+			headless=True,
+			args=[
+				'--no-sandbox',
+				'--disable-setuid-sandbox',
+				'--disable-dev-shm-usage',
+				'--disable-accelerated-2d-canvas',
+				'--no-first-run',
+				'--no-zygote',
+				'--disable-gpu',
+				'--disable-web-security',
+				'--disable-features=VizDisplayCompositor'
+			]
+		)
+	
+	async def run_all_scrapers(self) -> Dict[str, Dict[str, Listing]]:
+		"""Run all scrapers concurrently on a browser launched for this run and return each site's results."""
 		async with async_playwright() as p:
-			browser = await p.chromium.launch(
-				headless=True,
-				args=[
-					'--no-sandbox',
-					'--disable-setuid-sandbox',
-					'--disable-dev-shm-usage',
-					'--disable-accelerated-2d-canvas',
-					'--no-first-run',
-					'--no-zygote',
-					'--disable-gpu',
-					'--disable-web-security',
-					'--disable-features=VizDisplayCompositor'
-				]
-			)
+			browser = await self.launch_browser(p)
 			
 			context_bat, context_pcar, context_cab = await self.create_browser_contexts(browser)
 			
+			contexts = {'bat': context_bat, 'pcar': context_pcar, 'cab': context_cab}
+			
 			try:
-				# Run all scrapers concurrently
-				results = await asyncio.gather(
-					bring_a_trailer.get_all_live(context_bat),
-					pcarmarket.get_all_live(context_pcar),
-					cars_and_bids.get_all_live(context_cab)
-				)
-				
-				# Validate results
-				scraper_names = ['bat', 'pcar', 'cab']
-				for i, name in enumerate(scraper_names):
-					listing_count = len(results[i])
-					logging.info(f"{name} returned {listing_count} listings")
-					
-					if self._should_skip_upload(name, listing_count):
-						logging.warning(f"Incomplete results for {name}. Skipping upload.")
-						return {}
-				
-				# Combine and return results
-				combined_data = {}
-				for result_dict in results:
-					combined_data.update(result_dict)
-				
-				# Process keywords for new listings
-				await self._process_keywords(context_cab)
-				
-				return combined_data
-					
+				return await self.scrape_all(contexts)
 			finally:
 				for ctx in [context_bat, context_pcar, context_cab]:
 					await ctx.close()
 				await browser.close()
 	
+	async def scrape_all(self, contexts: Dict[str, BrowserContext], process_keywords: bool = True) -> Dict[str, Dict[str, Listing]]:
+		"""
+		Run all scrapers concurrently on the given contexts and return each site's results.
+
+		Sites whose results look incomplete are left out, so they can be skipped
+		without discarding the other sites' listings.
+		"""
+		sites = list(self.scrapers)
+		# Run all scrapers concurrently
+		live_scrape = asyncio.gather(*(
+			self.scrapers[site].get_all_live(contexts[site]) for site in sites
+		), return_exceptions=True)
+		
+		if process_keywords and KEYWORDS_DURING_SCRAPE:
+			# Enrich listings stored by earlier cycles while this one scrapes. An enrichment
+			# failure is logged and does not discard the live results.
+			results, enriched = await asyncio.gather(live_scrape, self._process_keywords(contexts), return_exceptions=True)
+			if isinstance(enriched, Exception):
+				logging.error(f"Keyword extraction failed: {enriched}")
+		else:
+			results = await live_scrape
+		
+		# Validate each site's results on their own
+		site_results = {}
+		for site, result in zip(sites, results):
+			if isinstance(result, Exception):
+				logging.error(f"{site} scrape failed: {result}")
+				continue
+			logging.info(f"{site} returned {len(result)} listings")
+			
+			if self._should_skip_upload(site, len(result)):
+				logging.warning(f"Incomplete results for {site}. Skipping upload.")
+				continue
+			site_results[site] = result
+		
+		# Process keywords for new listings
+		if process_keywords and not KEYWORDS_DURING_SCRAPE:
+			try:
+				await self._process_keywords(contexts)
+			except Exception as e:
+				logging.error(f"Keyword extraction failed: {e}")
+		
+		return site_results
+	
+	async def scrape_site(self, site: str, context: BrowserContext) -> Dict[str, Listing]:
+		"""Scrape one site's live listings, or return {} if the results look incomplete."""
+		results = await self.scrapers[site].get_all_live(context)
+		logging.info(f"{site} returned {len(results)} listings")
+		if self._should_skip_upload(site, len(results)):
+			logging.warning(f"Incomplete results for {site}. Skipping refresh.")
+			return {}
+		return results
+	
 	def _should_skip_upload(self, scraper_name: str, listing_count: int) -> bool:
 		"""Determine if we should skip uploading based on listing count."""
 		if listing_count == 0:
@@ -138,230 +178,412 @@ class ScraperScheduler:
 			return True
 		return False
 	
-	async def _process_keywords(self, context: BrowserContext) -> None:
+	async def _process_keywords(self, contexts: Dict[str, BrowserContext]) -> None:
 		"""Process keyword extraction for listings that need it."""
-		conn = await asyncpg.connect(**PG_CONN)
-		try:
-			# Get listings that need keyword extraction
-			no_keywords = await conn.fetch("""
-				SELECT url, title, image, time, price, year, scraped_at, keywords
-				FROM live_listings
-				WHERE keywords IS NULL OR keywords = ''
-				LIMIT $1;
-			""", KEYWORD_BATCH_SIZE)
-			
-			if not no_keywords:
-				return
-			
-			# Create a pool of pages using an asyncio Queue
-			page_pool = asyncio.Queue()
-			for _ in range(ASYNC_KEYWORD_SCRAPE_COUNT):
-				page = await context.new_page()
-				await page_pool.put(page)
-
-			async def extract_kw(listing: asyncpg.Record):
-				# Acquire a page from the pool
-				page = await page_pool.get()
-				try:
-					kw = await self._extract_keywords_for_listing(listing, page)
-					return (listing["url"], kw) if kw else None
-				finally:
-					# Return the page back to the pool
-					await page_pool.put(page)
-
-			# Schedule all extraction tasks concurrently
-			tasks = [extract_kw(listing) for listing in no_keywords]
-			extraction_results = await asyncio.gather(*tasks, return_exceptions=True)
-
-			# Filter valid updates
-			updates = [
-				result for result in extraction_results
-				if result is not None and not isinstance(result, Exception)
-			]
+		await KeywordEnricher(contexts).run()
 
-			if updates:
-				await conn.executemany("""
-					UPDATE live_listings 
-					SET keywords = to_tsvector('english', $2) 
-					WHERE url = $1
-				""", updates)
-				logging.info(f"Updated keywords for {len(updates)} listings")
-		finally:
-			# Close all pages in the pool
-			while not page_pool.empty():
-				page = await page_pool.get()
-				await page.close()
-			await conn.close()
 
-	async def _extract_keywords_for_listing(self, listing: asyncpg.Record, page) -> None:
-		"""Extract keywords for a single listing using the provided page."""
-		title = listing['title']
-		try:
-			if title.startswith("BaT"):
-				kw = await bring_a_trailer.get_listing_details(listing["title"], listing["url"], page)
-			elif title.startswith("PCAR"):
-				kw = await pcarmarket.get_listing_details(listing["title"], listing["url"], page)
-			elif title.startswith("C&B"):
-				kw = await cars_and_bids.get_listing_details(listing["title"], listing["url"], page)
-			if kw:
-				logging.info(f"Extracted keywords for {title}")
-				return kw
-		except Exception as e:
-			logging.error(f"Error extracting keywords for {title}: {e}")
+def staging_table(source: str) -> str:
+	"""Name of a site's own staging table, created at API startup like temp_listings."""
+	if source not in SOURCES:
+		raise ValueError(f"Unknown source {source}")
+	return f"temp_listings_{source}"
 
 
 class DatabaseManager:
 	"""Handles all database operations for the scraper."""
 	
 	@staticmethod
-	async def store_listings(results: Dict) -> None:
-		"""Store scraping results in PostgreSQL database."""
-		conn = await asyncpg.connect(**PG_CONN)
-		scraped_at = datetime.now(timezone.utc)
-		
+	async def store_listings(results: Dict[str, Listing], source: str) -> None:
+		"""
+		Store one site's scraping results in PostgreSQL database.
+
+		The merge only covers live listings from that source, so sites are merged
+		independently and a site that was skipped keeps its listings.
+		"""
 		try:
-			# Step 1: Refresh temp table with current scrape
-			await DatabaseManager._refresh_temp_table(conn, results, scraped_at)
-			
-			# Step 2: Handle closed listings
-			await DatabaseManager._process_closed_listings(conn, scraped_at)
-			
-			# Step 3: Update existing listings
-			await DatabaseManager._update_existing_listings(conn, scraped_at)
-			
-			# Step 4: Insert new listings
-			await DatabaseManager._insert_new_listings(conn, results, scraped_at)
+			async with db.acquire() as conn:
+				# Merge the whole batch atomically so readers never see a half-applied cycle
+				async with conn.transaction():
+					await DatabaseManager._merge(conn, results, source, datetime.now(timezone.utc))
 			
 		except Exception as e:
-			logging.error(f"Error storing data in Postgres: {e}")
+			logging.error(f"Error storing {source} data in Postgres: {e}")
 			raise
-		finally:
-			await conn.close()
 	
 	@staticmethod
-	async def _refresh_temp_table(conn, results: Dict, scraped_at: datetime) -> None:
-		"""Truncate and repopulate temp_listings table."""
-		await conn.execute("TRUNCATE temp_listings")
+	async def _merge(conn, results: Dict[str, Listing], source: str, scraped_at: datetime) -> None:
+		"""Merge one site's results into live_listings on conn, which must be in a transaction."""
+		staging = staging_table(source)
+		
+		# Step 1: Refresh the site's staging table with current scrape
+		await DatabaseManager._refresh_temp_table(conn, staging, results, scraped_at)
+		
+		# Step 2: Handle closed listings
+		await DatabaseManager._process_closed_listings(conn, staging, source, scraped_at)
+		
+		# Step 3: Append bid history for new and changed prices
+		await DatabaseManager._record_bid_history(conn, staging, scraped_at)
+		
+		# Step 4: Update existing listings
+		await DatabaseManager._update_existing_listings(conn, staging, scraped_at)
+		
+		# Step 5: Insert new listings
+		await DatabaseManager._insert_new_listings(conn, staging, scraped_at)
+		
+		# Step 6: Record that every remaining live listing from the site was seen this cycle
+		await DatabaseManager._record_heartbeat(conn, scraped_at, source)
+		
+		# Step 7: Refresh sold price stats for models that closed this cycle
+		await DatabaseManager._refresh_price_stats(conn, scraped_at)
+	
+	@staticmethod
+	async def final_window_ends(window_seconds: int) -> Dict[str, datetime]:
+		"""Soonest end time per site among live listings that have not been over for longer than the window."""
+		async with db.acquire() as conn:
+			rows = await conn.fetch("""
+				SELECT source, MIN(time) AS ends
+				FROM live_listings
+				WHERE time >= NOW() - make_interval(secs => $1) AND source IS NOT NULL
+				GROUP BY source
+			""", window_seconds)
+		return {row["source"]: row["ends"] for row in rows}
+	
+	@staticmethod
+	def _row_count(status: str) -> int:
+		"""Parse the affected row count from a command status like 'INSERT 0 12'."""
+		return int(status.split()[-1])
+	
+	@staticmethod
+	def _staging_records(results: Dict[str, Listing], scraped_at: datetime) -> List[Tuple]:
+		"""Build temp_listings rows in STAGING_COLUMNS order."""
+		return [listing.to_record(scraped_at) for listing in results.values()]
+	
+	@staticmethod
+	async def _refresh_temp_table(conn, staging: str, results: Dict[str, Listing], scraped_at: datetime) -> None:
+		"""Truncate a staging table and bulk load the current scrape with binary COPY."""
+		# Each site has its own staging table, so merges of different sites do not block each other
+		await conn.execute(f"TRUNCATE {staging}")
 		
 		if results:
-			await conn.executemany("""
-				INSERT INTO temp_listings (url, title, image, time, price, year, scraped_at)
-				VALUES ($1, $2, $3, $4, $5, $6, $7)
-			""", [
-				(listing["url"], listing["title"], listing["image"], 
-				listing["time"], listing["price"], listing["year"], scraped_at)
-				for listing in results.values()
-			])
+			await conn.copy_records_to_table(
+				staging,
+				records=DatabaseManager._staging_records(results, scraped_at),
+				columns=STAGING_COLUMNS
+			)
 	
 	@staticmethod
-	async def _process_closed_listings(conn, scraped_at: datetime) -> None:
-		"""Move closed listings from live to closed table."""
-		closed_rows = await conn.fetch("""
-			SELECT l.url, l.title, l.image, l.time, l.price, l.year, l.scraped_at
-			FROM live_listings l
-			LEFT JOIN temp_listings t ON l.url = t.url
-			WHERE t.url IS NULL
-		""")
+	async def _process_closed_listings(conn, staging: str, source: str, scraped_at: datetime) -> None:
+		"""Move the source's live listings missing from its staging table to the closed table, keeping their extracted keywords searchable."""
+		status = await conn.execute(f"""
+			WITH closed AS (
+				DELETE FROM live_listings l
+				WHERE l.source = $2
+				AND NOT EXISTS (SELECT 1 FROM {staging} t WHERE t.url = l.url)
+				RETURNING l.url, l.title, l.image, l.price, l.price_cents, l.currency, l.year, l.source, l.keywords
+			)
+			INSERT INTO closed_listings (url, title, image, price, price_cents, currency, year, source, keywords, closed_at)
+			SELECT url, title, image, price, price_cents, currency, year, source, keywords, $1
+			FROM closed
+			ON CONFLICT (url) DO UPDATE
+			SET price = EXCLUDED.price, price_cents = EXCLUDED.price_cents,
+				currency = EXCLUDED.currency, closed_at = EXCLUDED.closed_at,
+				keywords = COALESCE(EXCLUDED.keywords, closed_listings.keywords)
+		""", scraped_at, source)
 		
-		if closed_rows:
-			# Insert into closed_listings
-			await conn.executemany("""
-				INSERT INTO closed_listings (url, title, image, price, year, closed_at)
-				VALUES ($1, $2, $3, $4, $5, $6)
-				ON CONFLICT (url) DO NOTHING
-			""", [
-				(row[0], row[1], row[2], row[4], row[5], scraped_at)
-				for row in closed_rows
-			])
-			
-			# Remove from live_listings
-			await conn.executemany("""
-				DELETE FROM live_listings WHERE url = $1
-			""", [(row[0],) for row in closed_rows])
-			
-			logging.info(f"Moved {len(closed_rows)} closed listings")
+		moved = DatabaseManager._row_count(status)
+		if moved:
+			logging.info(f"Moved {moved} closed {source} listings")
+	
+	@staticmethod
+	async def _record_bid_history(conn, staging: str, scraped_at: datetime) -> None:
+		"""Append the prices that differ from live_listings, before step 4 overwrites them."""
+		recorded = await record_bid_changes(conn, staging, scraped_at)
+		if recorded:
+			logging.info(f"Recorded {recorded} bid changes")
 	
 	@staticmethod
-	async def _update_existing_listings(conn, scraped_at: datetime) -> None:
-		"""Update existing listings with new data."""
-		update_rows = await conn.fetch("""
-			SELECT t.url, t.time, t.price, t.scraped_at
-			FROM temp_listings t
-			INNER JOIN live_listings l ON t.url = l.url
-		""")
+	async def _refresh_price_stats(conn, scraped_at: datetime) -> None:
+		"""Recompute price stats only for the groups of listings closed in step 2."""
+		refreshed = await refresh_price_stats(conn, closed_at=scraped_at)
+		if refreshed:
+			logging.info(f"Refreshed price stats for {refreshed} model years")
+	
+	@staticmethod
+	async def _update_existing_listings(conn, staging: str, scraped_at: datetime) -> None:
+		"""Update existing listings whose price or end time actually changed."""
+		status = await conn.execute(f"""
+			UPDATE live_listings l
+			SET time = t.time, price = t.price, price_cents = t.price_cents,
+				currency = t.currency, scraped_at = $1
+			FROM {staging} t
+			WHERE t.url = l.url
+			AND (
+				l.price IS DISTINCT FROM t.price
+				OR l.price_cents IS DISTINCT FROM t.price_cents
+				OR (l.time IS NULL) <> (t.time IS NULL)
+				OR abs(extract(epoch FROM l.time - t.time)) > $2
+			)
+		""", scraped_at, END_TIME_TOLERANCE_SECONDS)
 		
-		if update_rows:
-			await conn.executemany("""
-				UPDATE live_listings
-				SET time = $2, price = $3, scraped_at = $4
-				WHERE url = $1
-			""", [
-				(row[0], row[1], row[2], scraped_at)
-				for row in update_rows
-			])
-			
-			logging.info(f"Updated {len(update_rows)} existing listings")
+		updated = DatabaseManager._row_count(status)
+		if updated:
+			logging.info(f"Updated {updated} existing listings")
 	
 	@staticmethod
-	async def _insert_new_listings(conn, results: Dict, scraped_at: datetime) -> None:
+	async def _insert_new_listings(conn, staging: str, scraped_at: datetime) -> None:
 		"""Insert new listings into live_listings table."""
-		new_urls = [row[0] for row in await conn.fetch("""
-			SELECT t.url FROM temp_listings t
-			LEFT JOIN live_listings l ON t.url = l.url
-			WHERE l.url IS NULL
-		""")]
+		# Existing rows were already refreshed in step 4, so conflicts are skipped
+		status = await conn.execute(f"""
+			INSERT INTO live_listings (url, title, image, time, price, price_cents, currency, year, source, scraped_at)
+			SELECT url, title, image, time, price, price_cents, currency, year, source, $1
+			FROM {staging}
+			ON CONFLICT (url) DO NOTHING
+		""", scraped_at)
 		
-		if new_urls:
-			new_listings = [
-				next(l for l in results.values() if l["url"] == url) 
-				for url in new_urls
-			]
-			
-			await conn.executemany("""
-				INSERT INTO live_listings (url, title, image, time, price, year, scraped_at)
-				VALUES ($1, $2, $3, $4, $5, $6, $7)
-			""", [
-				(listing["url"], listing["title"], listing["image"],
-				listing["time"], listing["price"], listing["year"], scraped_at)
-				for listing in new_listings
-			])
-			
-			logging.info(f"Inserted {len(new_listings)} new listings")
+		inserted = DatabaseManager._row_count(status)
+		if inserted:
+			logging.info(f"Inserted {inserted} new listings")
+	
+	@staticmethod
+	async def _record_heartbeat(conn, scraped_at: datetime, source: str) -> None:
+		"""Store the last time a source's scrape was merged, instead of touching every unchanged row."""
+		await conn.execute("""
+			INSERT INTO scrape_status (source, last_seen_at)
+			VALUES ($1, $2)
+			ON CONFLICT (source) DO UPDATE SET last_seen_at = EXCLUDED.last_seen_at
+		""", source, scraped_at)
 
 
 async def run_scrapers():
-	"""Main function to run all scrapers and store results."""
+	"""Main function to run all scrapers and store each site's results on its own."""
 	scheduler = ScraperScheduler()
 	
 	try:
 		# Run scrapers and get results
-		results = await scheduler.run_all_scrapers()
-		
-		if results:  # Only store if we have valid results
-			await DatabaseManager.store_listings(results)
-			logging.info(f"Successfully processed {len(results)} total listings")
-		else:
-			logging.warning("No results to store")
-			
+		site_results = await scheduler.run_all_scrapers()
 	except Exception as e:
 		logging.error(f"Error during scraping: {e}")
 		raise
+	
+	if not site_results:
+		logging.warning("No results to store")
+		return
+	
+	# One site failing to merge does not undo the others
+	failed = []
+	for site, results in site_results.items():
+		try:
+			await DatabaseManager.store_listings(results, site)
+			logging.info(f"Successfully processed {len(results)} {site} listings")
+		except Exception:
+			# Already logged by store_listings
+			failed.append(site)
+	if len(failed) == len(site_results):
+		raise RuntimeError(f"Could not store results for {', '.join(failed)}")
 
 
-def job():
-	"""Wrapper function for scheduled job execution."""
-	logging.info("Scheduled job started")
-	try:
-		asyncio.run(run_scrapers())
-	except Exception as e:
-		logging.error(f"Job failed: {e}")
-	logging.info("Scheduled job finished")
+class SchedulerService:
+	"""
+	Long-running scheduler that works through the refresh queue on one event loop.
+
+	The browser, one context per site and the DB pool are opened once and reused by
+	every task. Tasks run as soon as they are due and may overlap, except that a task
+	never starts while another task is loading any of the same sites (including an
+	earlier run of itself), so slow cycles delay the next one instead of piling up.
+	SIGTERM and SIGINT stop new tasks, give running ones SCHEDULER_SHUTDOWN_SECONDS
+	to finish, then close everything.
+	"""
+	
+	def __init__(self, scheduler: Optional[ScraperScheduler] = None, shutdown_seconds: float = SCHEDULER_SHUTDOWN_SECONDS):
+		self.scheduler = scheduler or ScraperScheduler()
+		self.queue = RefreshQueue(list(self.scheduler.scrapers))
+		self.shutdown_seconds = shutdown_seconds
+		self._playwright = None
+		self._browser = None
+		self._contexts: Dict[str, BrowserContext] = {}
+		# Held while (re)launching Chromium, so concurrent tasks share one browser
+		self._browser_lock = asyncio.Lock()
+		self._running: Dict[asyncio.Task, RefreshTask] = {}
+		# Due tasks that overlap a running one, retried in order when something finishes
+		self._blocked: List[RefreshTask] = []
+		self._wake = asyncio.Event()
+		self._stopping = asyncio.Event()
+		
+		# Metrics
+		self.browser_launches = 0
+		self.completed = 0
+		self.failed = 0
+	
+	def stop(self) -> None:
+		"""Stop starting tasks and begin shutting down."""
+		if not self._stopping.is_set():
+			logging.info("Scheduler stopping")
+		self._stopping.set()
+		self._wake.set()
+	
+	async def _ensure_browser(self) -> Dict[str, BrowserContext]:
+		"""Return the per-site contexts, relaunching Chromium if it has gone away."""
+		if self._browser is not None and self._browser.is_connected():
+			return self._contexts
+		
+		async with self._browser_lock:
+			# Another task may have launched it while we waited
+			if self._browser is not None and self._browser.is_connected():
+				return self._contexts
+			if self._playwright is None:
+				self._playwright = await async_playwright().start()
+			self._browser = await self.scheduler.launch_browser(self._playwright)
+			self._contexts = {
+				site: await self.scheduler.create_browser_context(self._browser, site)
+				for site in self.scheduler.scrapers
+			}
+			self.browser_launches += 1
+			logging.info(f"Launched scheduler browser (launch {self.browser_launches})")
+			return self._contexts
+	
+	async def _run_task(self, task: RefreshTask) -> None:
+		"""Run one task popped from the refresh queue."""
+		if task.kind in (SWEEP, FINAL):
+			# Every load covers the whole site, so a final refresh is merged as a full sweep
+			contexts = await self._ensure_browser()
+			results = await self.scheduler.scrape_site(task.site, contexts[task.site])
+			if results:
+				await DatabaseManager.store_listings(results, task.site)
+				logging.info(f"Successfully processed {len(results)} {task.site} listings")
+		elif task.kind == KEYWORDS:
+			async with db.acquire() as conn:
+				backlog = await backlog_stats(conn)
+			if backlog["due"]:
+				await KeywordEnricher(await self._ensure_browser()).run()
+	
+	async def _plan(self) -> None:
+		"""Queue each site's next sweep, the next keyword batch, and a final refresh for each site with auctions about to end."""
+		now = time.time()
+		for site in self.queue.sites:
+			self.queue.schedule(SWEEP, now, site)
+		self.queue.schedule(KEYWORDS, now)
+		window = FINAL_WINDOW_MINUTES * 60
+		for site, ends in (await DatabaseManager.final_window_ends(window)).items():
+			if site in self.queue.sites:
+				self.queue.schedule(FINAL, ends.timestamp() - window, site)
+	
+	async def _execute(self, task: RefreshTask) -> None:
+		label = task.kind + (f" for {task.site}" if task.site else "")
+		started = time.monotonic()
+		logging.info(f"{label} task started")
+		try:
+			await self._run_task(task)
+			self.completed += 1
+		except asyncio.CancelledError:
+			logging.warning(f"{label} task cancelled")
+			raise
+		except Exception as e:
+			self.failed += 1
+			logging.error(f"{label} task failed: {e}")
+		logging.info(f"{label} task finished in {time.monotonic() - started:.1f}s")
+		
+		try:
+			await self._plan()
+		except Exception as e:
+			logging.error(f"Could not plan refreshes: {e}")
+	
+	def _conflicts(self, task: RefreshTask, others: List[RefreshTask]) -> bool:
+		"""Whether any of others has the same key or loads any of the same sites."""
+		sites = set(self.queue.sites_of(task))
+		return any(
+			other.key == task.key or sites & set(self.queue.sites_of(other))
+			for other in others
+		)
+	
+	def _on_done(self, future: asyncio.Task) -> None:
+		self._running.pop(future, None)
+		logging.info(f"Refresh queue: {self.queue.stats(time.time())}, DB pool: {db.pool.stats()}")
+		self._wake.set()
+	
+	def _start_due_tasks(self) -> None:
+		"""Start due tasks in order, holding back any that overlap a running or earlier held task."""
+		now = time.time()
+		# Held tasks go first, so a steady stream of short tasks cannot starve them
+		due = self._blocked
+		self._blocked = []
+		while (task := self.queue.pop_due(now)) is not None:
+			due.append(task)
+		
+		for task in due:
+			if any(held.key == task.key for held in self._blocked):
+				# Already waiting for its turn
+				continue
+			if self.queue.ran_recently(task, now):
+				# Covered while it was held, _plan queues the next one
+				continue
+			if self._conflicts(task, list(self._running.values()) + self._blocked):
+				self._blocked.append(task)
+				continue
+			self.queue.start(task, now)
+			future = asyncio.create_task(self._execute(task))
+			self._running[future] = task
+			future.add_done_callback(self._on_done)
+	
+	async def _wait(self) -> None:
+		"""Sleep until the next task is due or a running task finishes."""
+		self._wake.clear()
+		next_due = self.queue.next_due()
+		timeout = max(next_due - time.time(), 0) if next_due is not None else None
+		try:
+			await asyncio.wait_for(self._wake.wait(), timeout)
+		except asyncio.TimeoutError:
+			pass
+	
+	async def run(self) -> None:
+		"""Run until SIGTERM or SIGINT."""
+		loop = asyncio.get_running_loop()
+		for sig in (signal.SIGTERM, signal.SIGINT):
+			loop.add_signal_handler(sig, self.stop)
+		
+		await db.pool.open()
+		try:
+			# Launch the browser before the startup sweeps, which would otherwise all
+			# ask for it at once. A failed launch is retried by the first task.
+			try:
+				await self._ensure_browser()
+			except Exception as e:
+				logging.error(f"Could not launch browser: {e}")
+			
+			# Sweep every site once on startup, then follow the queue
+			for site in self.queue.sites:
+				self.queue.schedule(SWEEP, time.time(), site)
+			while not self._stopping.is_set():
+				self._start_due_tasks()
+				await self._wait()
+		finally:
+			await self._shutdown()
+	
+	async def _shutdown(self) -> None:
+		if self._running:
+			logging.info(f"Waiting up to {self.shutdown_seconds}s for {len(self._running)} running tasks")
+			_, pending = await asyncio.wait(list(self._running), timeout=self.shutdown_seconds)
+			for future in pending:
+				future.cancel()
+			if pending:
+				await asyncio.gather(*pending, return_exceptions=True)
+		
+		for ctx in self._contexts.values():
+			try:
+				await ctx.close()
+			except Exception:
+				pass
+		if self._browser is not None:
+			try:
+				await self._browser.close()
+			except Exception:
+				pass
+		if self._playwright is not None:
+			await self._playwright.stop()
+		logging.info(f"DB pool stats: {db.pool.stats()}")
+		await db.pool.close()
+		logging.info(f"Scheduler stopped after {self.completed} tasks ({self.failed} failed)")
 
 
 if __name__ == "__main__":
-	schedule.every(SCHEDULE_INTERVAL_MINUTES).minutes.do(job)
-	job()  # Run once on startup
-	
-	while True:
-		schedule.run_pending()
-		time.sleep(60)
\ No newline at end of file
+	asyncio.run(SchedulerService().run())
@@ -0,0 +1,119 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+# Cache config
+SEARCH_CACHE_TTL_SECONDS = int(os.environ.get("SEARCH_CACHE_TTL_SECONDS", 300))
+SEARCH_CACHE_MAX_BYTES = int(os.environ.get("SEARCH_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+SEARCH_CACHE_REFRESH_CHECK_SECONDS = int(os.environ.get("SEARCH_CACHE_REFRESH_CHECK_SECONDS", 30))
+
+
+def normalize_query(query: Optional[str]) -> str:
+	"""
+	Cache key for a search query, so queries differing only in case or spacing share an entry.
+
+	Word order is kept because the sites rank results by it. The key is never sent to a site.
+	"""
+	return " ".join((query or "").lower().split())
+
+
+def _json_default(value):
+	"""Size Listing objects by their API representation."""
+	return value.to_dict() if hasattr(value, "to_dict") else str(value)
+
+
+class SearchCache:
+	"""Per-site LRU cache of search results, bounded by approximate memory size."""
+
+	def __init__(self, ttl_seconds: int = SEARCH_CACHE_TTL_SECONDS, max_bytes: int = SEARCH_CACHE_MAX_BYTES,
+			refresh_check_seconds: int = SEARCH_CACHE_REFRESH_CHECK_SECONDS):
+		self.ttl_seconds = ttl_seconds
+		self.max_bytes = max_bytes
+		self.refresh_check_seconds = refresh_check_seconds
+
+		# (site, query) -> (stored_at, size, results)
+		self._entries: "OrderedDict[Tuple[str, str], Tuple[float, int, Dict]]" = OrderedDict()
+		self._bytes = 0
+
+		# Entries stored before the scheduler's last refresh of their site are stale
+		self.refreshed_at: Dict[str, float] = {}
+		self._refresh_checked_at = 0.0
+
+		# Metrics
+		self.hits: Dict[str, int] = {}
+		self.misses: Dict[str, int] = {}
+		self.evictions = 0
+		self.expirations = 0
+
+	def get(self, site: str, query: str) -> Optional[Dict]:
+		"""Return cached results for a site and normalized query, or None."""
+		key = (site, query)
+		entry = self._entries.get(key)
+		if entry is not None and not self._is_fresh(site, entry[0]):
+			self._remove(key)
+			self.expirations += 1
+			entry = None
+
+		if entry is None:
+			self.misses[site] = self.misses.get(site, 0) + 1
+			return None
+
+		self._entries.move_to_end(key)
+		self.hits[site] = self.hits.get(site, 0) + 1
+		return entry[2]
+
+	def set(self, site: str, query: str, results: Dict) -> None:
+		"""Store results for a site and normalized query, evicting least recently used entries."""
+		key = (site, query)
+		size = len(json.dumps(results, default=_json_default))
+		if size > self.max_bytes:
+			return
+
+		if key in self._entries:
+			self._remove(key)
+		self._entries[key] = (time.time(), size, results)
+		self._bytes += size
+
+		while self._bytes > self.max_bytes:
+			oldest = next(iter(self._entries))
+			self._remove(oldest)
+			self.evictions += 1
+
+	def _is_fresh(self, site: str, stored_at: float) -> bool:
+		return time.time() - stored_at < self.ttl_seconds and stored_at >= self.refreshed_at.get(site, 0.0)
+
+	def _remove(self, key: Tuple[str, str]) -> None:
+		_, size, _ = self._entries.pop(key)
+		self._bytes -= size
+
+	def refresh_check_due(self) -> bool:
+		"""Whether the scheduler's last refresh times should be looked up again."""
+		return time.time() - self._refresh_checked_at >= self.refresh_check_seconds
+
+	def mark_refreshed(self, refreshed_at: Dict[str, datetime]) -> None:
+		"""Record when the scheduler last refreshed each site's listings, expiring only that site's entries."""
+		self._refresh_checked_at = time.time()
+		for site, at in refreshed_at.items():
+			if at is not None:
+				self.refreshed_at[site] = max(self.refreshed_at.get(site, 0.0), at.timestamp())
+
+	def stats(self) -> Dict:
+		hits = sum(self.hits.values())
+		misses = sum(self.misses.values())
+		return {
+			"entries": len(self._entries),
+			"bytes": self._bytes,
+			"max_bytes": self.max_bytes,
+			"hits": hits,
+			"misses": misses,
+			"hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+			"evictions": self.evictions,
+			"expirations": self.expirations,
+			"sites": {
+				site: {"hits": self.hits.get(site, 0), "misses": self.misses.get(site, 0)}
+				for site in sorted(set(self.hits) | set(self.misses))
+			}
+		}
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+	"""An in-flight task and the number of callers awaiting it."""
+
+	def __init__(self, task: asyncio.Task):
+		self.task = task
+		self.waiters = 0
+
+
+class SingleFlight:
+	"""Coalesce concurrent calls with the same key into one shared task."""
+
+	def __init__(self):
+		self._calls: Dict[Hashable, _Call] = {}
+
+		# Metrics
+		self.started = 0
+		self.coalesced = 0
+		self.cancelled = 0
+
+	async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+		"""
+		Await fn() for the given key, joining an in-flight call if there is one.
+
+		The shared task is only cancelled once every caller waiting on it has
+		been cancelled, so one client disconnecting does not abort the others.
+		"""
+		call = self._calls.get(key)
+		if call is None:
+			call = _Call(asyncio.ensure_future(fn()))
+			self._calls[key] = call
+			call.task.add_done_callback(lambda _: self._forget(key, call))
+			self.started += 1
+		else:
+			self.coalesced += 1
+
+		call.waiters += 1
+		try:
+			return await asyncio.shield(call.task)
+		finally:
+			call.waiters -= 1
+			if call.waiters == 0 and not call.task.done():
+				# Forget it now rather than once the cancellation lands, so a caller
+				# arriving in between starts a fresh call instead of joining this one
+				self._forget(key, call)
+				call.task.cancel()
+				self.cancelled += 1
+
+	def _forget(self, key: Hashable, call: _Call) -> None:
+		if self._calls.get(key) is call:
+			del self._calls[key]
+
+	def stats(self) -> Dict:
+		return {
+			"in_flight": len(self._calls),
+			"started": self.started,
+			"coalesced": self.coalesced,
+			"cancelled": self.cancelled
+		}